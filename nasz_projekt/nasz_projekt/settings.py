@@ -41,9 +41,13 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+# Session logins load the user's User_acc along with the user. Sessions
+# created under another backend are asked to log in again.
+AUTHENTICATION_BACKENDS = ['store.authentication.AccountBackend']
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'store.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -51,7 +55,32 @@ REST_FRAMEWORK = {
     ],
 }
 
+# store.authentication: seconds a resolved token stays cached per process,
+# max cached tokens per process, and optional token lifetime (None: never
+# expires; expired tokens are replaced on the next login).
+STORE_TOKEN_CACHE_TTL = 60
+STORE_TOKEN_CACHE_SIZE = 10000
+STORE_TOKEN_EXPIRY = None
+
+# store.throttling: login and token requests allowed per (limit, window in
+# seconds), per client IP and per username. The attempt log is a SQLite
+# file that must be on local disk and shared by all workers on the host.
+STORE_LOGIN_THROTTLE_RATES = {
+    'ip': (30, 60),
+    'username': (10, 300),
+}
+STORE_LOGIN_THROTTLE_DB = BASE_DIR / 'login_throttle.sqlite3'
+
+# Threads hashing passwords in the staff user-provisioning API.
+STORE_PROVISION_HASH_THREADS = 4
+
+# store.imports: bag rows validated and upserted per query, for the import
+# API and as the default of manage.py import_bags --batch-size.
+STORE_IMPORT_BATCH_SIZE = 1000
+
 MIDDLEWARE = [
+    'store.middleware.MetricsMiddleware',
+    'store.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +102,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.cart_badge',
             ],
         },
     },
@@ -88,9 +118,52 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent checkouts would otherwise fail with "database is
+        # locked" (bench_funnel at concurrency 4 loses over half its order
+        # summaries): WAL lets readers run alongside the writer and IMMEDIATE
+        # makes transactions queue for the write lock instead of erroring.
+        # WAL keeps db.sqlite3-wal/-shm next to the database while it is open.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bagz',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
     }
 }
 
+# Cached catalog pages are invalidated by a version bump whenever a Bag
+# changes. The version is stored in the database; each process caches it for
+# CATALOG_VERSION_TTL seconds, which bounds how long a bump made by another
+# worker process can go unnoticed.
+CATALOG_CACHE_TIMEOUT = 300
+CATALOG_VERSION_TTL = 2
+
+
+# Metrics
+# Every worker process snapshots its counters into STORE_METRICS_DIR, and
+# /metrics reports the totals across all of them. The directory must be on
+# local disk, shared by the workers on the host, and emptied on deploy. Set
+# it to None only when a single process serves requests.
+# /metrics is served to staff sessions, and to scrapers sending
+# "Authorization: Bearer <STORE_METRICS_TOKEN>" when that is set.
+STORE_METRICS_DIR = BASE_DIR / 'metrics'
+STORE_METRICS_FLUSH_INTERVAL = 1.0
+STORE_METRICS_TOKEN = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,37 @@
+from .models import User_acc
+
+
+def default_account_fields(user):
+    return {
+        'name': user.first_name or user.username,
+        'surname': user.last_name or user.username,
+        'email': user.email or f'{user.username}@example.com',
+        'street_name': 'Not provided',
+        'home_nr': '0',
+        'city': 'Not provided',
+        'zip_code': '00-000',
+        'country': 'US',
+        'phone_number': '+1234567890',
+    }
+
+
+def get_user_acc(request):
+    """Return the User_acc of the authenticated user, or None.
+
+    Session logins load the account together with the user in one query
+    (see store.authentication.AccountBackend), so reading it here runs no query;
+    token logins fetch it on first use. Accounts missing for older users
+    are created with default_account_fields().
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    try:
+        return user.user_acc
+    except User_acc.DoesNotExist:
+        user_acc, _ = User_acc.objects.get_or_create(
+            django_user=user,
+            defaults=default_account_fields(user)
+        )
+        user.user_acc = user_acc
+        return user_acc
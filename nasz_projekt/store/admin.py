@@ -1,27 +1,140 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 from .models import Bag
-from .models import Order, OrderSummary, OrderSummaryItem
+from .models import Order, OrderItem, OrderSummary, OrderSummaryItem
 from .models import User_acc
 from .models import Cart, CartItem
+from .pagination import EstimatedCountPaginator
+from .reporting import order_days, rebuild_days
 
 
-admin.site.register(Bag)
-admin.site.register(Order)
-admin.site.register(OrderSummary)
-admin.site.register(OrderSummaryItem)
-admin.site.register(User_acc)
-admin.site.register(Cart)
-admin.site.register(CartItem)
+STATUS_UPDATE_CHUNK_SIZE = 1000
 
 
-class OrderItemInline(admin.TabularInline):
+def update_in_chunks(queryset, chunk_size=STATUS_UPDATE_CHUNK_SIZE, **values):
+    """queryset.update(**values) in primary-key order, one transaction per chunk.
+
+    Each chunk is one indexed SELECT of ids plus one UPDATE, so even an
+    action over "all N orders" never holds the write lock for long.
+    """
+    updated = 0
+    last_pk = 0
+    queryset = queryset.order_by('pk')
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return updated
+        with transaction.atomic():
+            updated += queryset.model._default_manager.filter(pk__in=pks).update(**values)
+        last_pk = pks[-1]
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """No COUNT(*) over the whole table on every changelist page."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Bag)
+class BagAdmin(ScalableAdmin):
+    list_display = ("id", "brand", "model_name", "size", "color", "fabric", "price", "amount")
+    list_filter = ("size", "fabric", "color")
+    search_fields = ("brand", "model_name")
+    ordering = ("-id",)
+
+
+@admin.register(User_acc)
+class User_accAdmin(ScalableAdmin):
+    list_display = ("id", "name", "surname", "email", "city", "country")
+    list_select_related = ("django_user",)
+    search_fields = ("email", "surname", "django_user__username")
+    autocomplete_fields = ("django_user",)
+    ordering = ("-id",)
+
+
+class ReadOnlyCartItemsMixin:
+    """Cart items change only through store.carts, which keeps the cart's
+    stored total_price and item_count in step; the admin just shows them."""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class CartItemInline(ReadOnlyCartItemsMixin, admin.TabularInline):
+    model = CartItem
+    extra = 0
+    readonly_fields = ("bag", "quantity", "price_at_time")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("bag")
+
+
+@admin.register(Cart)
+class CartAdmin(ScalableAdmin):
+    list_display = ("id", "user_cart", "item_count", "total_price", "created_at")
+    list_select_related = ("user_cart",)
+    search_fields = ("=id", "user_cart__email")
+    autocomplete_fields = ("user_cart",)
+    readonly_fields = ("total_price", "item_count", "created_at")
+    ordering = ("-id",)
+    inlines = [CartItemInline]
+
+
+@admin.register(CartItem)
+class CartItemAdmin(ReadOnlyCartItemsMixin, ScalableAdmin):
+    list_display = ("id", "cart", "bag", "quantity", "price_at_time")
+    list_select_related = ("cart__user_cart", "bag")
+    ordering = ("-id",)
+
+
+class OrderSummaryItemInline(admin.TabularInline):
     model = OrderSummaryItem
     extra = 0
     readonly_fields = ("bag", "quantity", "price_at_time")
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("bag")
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    readonly_fields = ("bag", "quantity", "price_at_time")
+    can_delete = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("bag")
+
+
+@admin.register(OrderSummary)
+class OrderSummaryAdmin(ScalableAdmin):
+    list_display = ("id", "user", "total_price", "created_at")
+    list_select_related = ("user",)
+    search_fields = ("=id", "user__email")
+    # Ordered by id rather than created_at: same order, but it follows the
+    # primary key index instead of sorting the table.
+    ordering = ("-id",)
+    readonly_fields = ("user", "total_price", "created_at")
+    inlines = [OrderSummaryItemInline]
+
 
-class OrderAdmin(admin.ModelAdmin):
+@admin.register(OrderSummaryItem)
+class OrderSummaryItemAdmin(ScalableAdmin):
+    list_display = ("id", "summary", "bag", "quantity", "price_at_time")
+    list_select_related = ("summary", "bag")
+    autocomplete_fields = ("summary", "bag")
+    ordering = ("-id",)
+
+
+@admin.register(Order)
+class OrderAdmin(ScalableAdmin):
     list_display = (
         "id",
         "user",
@@ -31,12 +144,13 @@ class OrderAdmin(admin.ModelAdmin):
     )
 
     list_filter = ("status", "created_at")
-    search_fields = ("id", "user__email")
-    ordering = ("-created_at",)
-
-    inlines = [OrderItemInline]
+    list_select_related = ("user",)
+    search_fields = ("=id", "user__email")
+    ordering = ("-id",)
 
     readonly_fields = ("user", "total_price", "created_at")
+    inlines = [OrderItemInline]
+    actions = ["mark_sent", "mark_done", "mark_canceled"]
 
     fieldsets = (
         ("Informacje podstawowe", {
@@ -46,3 +160,41 @@ class OrderAdmin(admin.ModelAdmin):
             "fields": ("total_price",)
         }),
     )
+
+    @staticmethod
+    def _rebuild_sales_days(days):
+        # Canceled orders don't count towards the sales rollups.
+        for day in days:
+            rebuild_days(day, day)
+
+    def save_model(self, request, obj, form, change):
+        canceling = Order.Status.CANCELED in (form.initial.get("status"), obj.status)
+        super().save_model(request, obj, form, change)
+        if change and "status" in form.changed_data and canceling:
+            self._rebuild_sales_days(order_days(Order.objects.filter(pk=obj.pk)))
+
+    def _set_status(self, request, queryset, new_status):
+        queryset = queryset.exclude(status=new_status)
+        if new_status != Order.Status.CANCELED:
+            days = order_days(queryset.filter(status=Order.Status.CANCELED))
+        else:
+            days = order_days(queryset)
+        updated = update_in_chunks(queryset, status=new_status)
+        self._rebuild_sales_days(days)
+        self.message_user(
+            request,
+            f"{updated} order(s) marked as {Order.Status(new_status).label.lower()}.",
+            messages.SUCCESS
+        )
+
+    @admin.action(description="Mark selected orders as sent", permissions=["change"])
+    def mark_sent(self, request, queryset):
+        self._set_status(request, queryset, Order.Status.SENT)
+
+    @admin.action(description="Mark selected orders as completed", permissions=["change"])
+    def mark_done(self, request, queryset):
+        self._set_status(request, queryset, Order.Status.DONE)
+
+    @admin.action(description="Mark selected orders as canceled", permissions=["change"])
+    def mark_canceled(self, request, queryset):
+        self._set_status(request, queryset, Order.Status.CANCELED)
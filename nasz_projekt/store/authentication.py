@@ -0,0 +1,158 @@
+"""Token authentication with an in-process cache of token -> user.
+
+Each worker keeps a bounded LRU of recently seen tokens, so repeat API
+calls skip the Token + User query. Entries live at most
+STORE_TOKEN_CACHE_TTL seconds. They are evicted right away in this process
+when the user logs out, the user row is saved (password change,
+deactivation) or the token is deleted or rotated; other worker processes
+notice within the TTL.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """LRU of token key -> (expiry, user, token), indexed by user id so a
+    user's entries can be dropped without scanning the whole cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+
+    def _remove(self, key):
+        # Caller holds the lock.
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user[entry[1].pk]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[1].pk]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, user, token):
+        ttl = getattr(settings, 'STORE_TOKEN_CACHE_TTL', 60)
+        size = getattr(settings, 'STORE_TOKEN_CACHE_SIZE', 10000)
+        if ttl <= 0 or size <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, user, token)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_key(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def token_expired(created):
+    expiry = getattr(settings, 'STORE_TOKEN_EXPIRY', None)
+    return expiry is not None and created < timezone.now() - timedelta(seconds=expiry)
+
+
+def _check(user, token):
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    if token_expired(token.created):
+        raise exceptions.AuthenticationFailed(_('Token has expired.'))
+    # Every request gets its own copy, so attributes a view sets on
+    # request.user never leak into other requests.
+    return copy.copy(user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for DRF's TokenAuthentication, backed by token_cache."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cached = (token.user, token)
+            token_cache.set(key, *cached)
+        return _check(*cached), cached[1]
+
+
+async def aauthenticate_token(key):
+    """Async counterpart of CachedTokenAuthentication; returns the user or None."""
+    cached = token_cache.get(key)
+    if cached is None:
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        if token is None:
+            return None
+        cached = (token.user, token)
+        token_cache.set(key, *cached)
+    try:
+        return _check(*cached)
+    except exceptions.AuthenticationFailed:
+        return None
+
+
+def rotate_token(user):
+    """Replace the user's token with a new one and return it."""
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+class AccountBackend(ModelBackend):
+    """ModelBackend that loads the user's User_acc and Cart in the same query.
+
+    Every session-authenticated page needs the account, and the header's
+    cart badge needs the cart, so both are joined in when the session's
+    user is looked up instead of being fetched after.
+    """
+
+    def _users(self):
+        return get_user_model()._default_manager.select_related('user_acc__cart')
+
+    def get_user(self, user_id):
+        user = self._users().filter(pk=user_id).first()
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        user = await self._users().filter(pk=user_id).afirst()
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,126 @@
+import hashlib
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from . import metrics
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_VERSION_PK = 1
+
+
+def _version_model():
+    # store.models imports this module, so the model is looked up lazily.
+    return apps.get_model('store', 'CatalogVersion')
+
+
+def get_catalog_version():
+    """Return the current catalog version.
+
+    The counter lives in the database, so every worker process agrees on it;
+    each process keeps a copy in the cache for CATALOG_VERSION_TTL seconds.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        row, _ = _version_model().objects.get_or_create(pk=CATALOG_VERSION_PK)
+        version = str(row.version)
+        cache.set(CATALOG_VERSION_KEY, version, settings.CATALOG_VERSION_TTL)
+    return version
+
+
+async def aget_catalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        row, _ = await _version_model().objects.aget_or_create(pk=CATALOG_VERSION_PK)
+        version = str(row.version)
+        await cache.aset(CATALOG_VERSION_KEY, version, settings.CATALOG_VERSION_TTL)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page at once.
+
+    Entries are keyed by version, so old pages are simply never read again
+    and age out of the cache on their own. Other processes pick the new
+    version up within CATALOG_VERSION_TTL seconds.
+    """
+    model = _version_model()
+    if not model.objects.filter(pk=CATALOG_VERSION_PK).update(version=F('version') + 1):
+        model.objects.get_or_create(pk=CATALOG_VERSION_PK, defaults={'version': 2})
+    cache.delete(CATALOG_VERSION_KEY)
+    # A read between now and the commit would cache the old version again.
+    transaction.on_commit(lambda: cache.delete(CATALOG_VERSION_KEY))
+
+
+def _catalog_digest(request, filters, cursor, page_size):
+    raw = json.dumps([
+        request.get_host(), request.path, filters, cursor, page_size
+    ], sort_keys=True)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_cache_key(request, filters, cursor, page_size):
+    digest = _catalog_digest(request, filters, cursor, page_size)
+    return f'catalog:{get_catalog_version()}:{digest}'
+
+
+async def acatalog_cache_key(request, filters, cursor, page_size):
+    digest = _catalog_digest(request, filters, cursor, page_size)
+    return f'catalog:{await aget_catalog_version()}:{digest}'
+
+
+def _count_lookup(request, data):
+    metrics.inc(
+        'store_cache_requests_total',
+        view=metrics.view_name(request),
+        cache='catalog',
+        result='miss' if data is None else 'hit'
+    )
+    return data
+
+
+def get_catalog_page(request, key):
+    return _count_lookup(request, cache.get(key))
+
+
+async def aget_catalog_page(request, key):
+    return _count_lookup(request, await cache.aget(key))
+
+
+def set_catalog_page(key, data):
+    cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+
+async def aset_catalog_page(key, data):
+    await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def _etag(version, request):
+    raw = '|'.join([
+        version,
+        request.get_host(),
+        request.get_full_path(),
+        request.headers.get('Accept', ''),
+    ])
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def catalog_etag(request, *args, **kwargs):
+    """ETag for a catalog API response.
+
+    The representation depends only on the catalog version, the URL with
+    its query string and the negotiated media type. The version changes on
+    every bump, so this is the only validator the catalog views send; a
+    Last-Modified date with one-second resolution could miss two bumps made
+    within the same second.
+    """
+    return _etag(get_catalog_version(), request)
+
+
+async def acatalog_etag(request):
+    return _etag(await aget_catalog_version(), request)
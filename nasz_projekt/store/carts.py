@@ -0,0 +1,144 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Bag, Cart, CartItem
+
+
+class CartError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Invalid cart operations.')
+
+
+def get_cart(user_acc):
+    """The account's cart, created on first use.
+
+    For session logins the row was loaded along with the user (see
+    store.authentication.AccountBackend), so this runs no query, and totals
+    adjusted on it show up in the header badge of the same response.
+    """
+    try:
+        return user_acc.cart
+    except Cart.DoesNotExist:
+        cart, _ = Cart.objects.get_or_create(user_cart=user_acc)
+        user_acc.cart = cart
+        return cart
+
+
+def adjust_cart_totals(cart, total_delta, count_delta):
+    """Shift the stored totals of `cart` in SQL; call inside the item write's transaction.
+
+    Totals never go below zero: if they had already drifted low (see
+    repair_cart_totals), a removal clamps them instead of failing the
+    PositiveIntegerField CHECK constraint.
+    """
+    if not total_delta and not count_delta:
+        return
+    Cart.objects.filter(pk=cart.pk).update(
+        total_price=Greatest(F('total_price') + total_delta, 0),
+        item_count=Greatest(F('item_count') + count_delta, 0)
+    )
+    cart.total_price = max(cart.total_price + total_delta, 0)
+    cart.item_count = max(cart.item_count + count_delta, 0)
+
+
+def items_total(items):
+    """What `items` cost at their cart prices.
+
+    Orders are charged this rather than the cart's stored total_price, which
+    only feeds the cart display and can drift from the items.
+    """
+    return sum(item.quantity * item.price_at_time for item in items)
+
+
+def clear_cart(cart):
+    cart.items.all().delete()
+    Cart.objects.filter(pk=cart.pk).update(total_price=0, item_count=0)
+    cart.total_price = cart.item_count = 0
+
+
+def carts_with_drift():
+    """Carts whose stored totals disagree with their items."""
+    items = CartItem.objects.filter(cart=OuterRef('pk')).values('cart')
+    return Cart.objects.annotate(
+        actual_total=Coalesce(Subquery(
+            items.annotate(total=Sum(F('quantity') * F('price_at_time'))).values('total')
+        ), 0),
+        actual_count=Coalesce(Subquery(
+            items.annotate(count=Sum('quantity')).values('count')
+        ), 0),
+    ).filter(~Q(total_price=F('actual_total')) | ~Q(item_count=F('actual_count')))
+
+
+def apply_cart_operations(cart, operations):
+    """Apply a batch of add/set/remove operations to `cart` atomically.
+
+    Stock for every bag in the batch is checked with one query and the
+    result is written with one bulk insert, one bulk update and one delete.
+    Either every operation is applied or CartError is raised with one entry
+    per operation, in the same shape as DRF's many=True serializer errors.
+    """
+    bag_ids = {operation['bag'] for operation in operations}
+    errors = [{} for _ in operations]
+
+    with transaction.atomic():
+        bags = Bag.objects.in_bulk(bag_ids)
+        items = {item.bag_id: item for item in cart.items.filter(bag_id__in=bag_ids)}
+        quantities = {bag_id: item.quantity for bag_id, item in items.items()}
+        last_operation = {}
+
+        for index, operation in enumerate(operations):
+            bag_id = operation['bag']
+            if bag_id not in bags:
+                errors[index] = {'bag': ['Bag does not exist.']}
+                continue
+            if operation['op'] == 'add':
+                quantities[bag_id] = quantities.get(bag_id, 0) + operation['quantity']
+            elif operation['op'] == 'set':
+                quantities[bag_id] = operation['quantity']
+            else:
+                quantities[bag_id] = 0
+            last_operation[bag_id] = index
+
+        for bag_id, quantity in quantities.items():
+            bag = bags.get(bag_id)
+            if bag is not None and quantity > bag.amount:
+                errors[last_operation[bag_id]] = {
+                    'quantity': [f'Available quantity for this product is: {bag.amount}.']
+                }
+
+        if any(errors):
+            raise CartError(errors)
+
+        to_create, to_update, to_delete = [], [], []
+        total_delta = count_delta = 0
+        for bag_id, quantity in quantities.items():
+            item = items.get(bag_id)
+            if item is not None:
+                count_delta += quantity - item.quantity
+                total_delta += (quantity - item.quantity) * item.price_at_time
+            else:
+                count_delta += quantity
+                total_delta += quantity * bags[bag_id].price
+            if quantity == 0:
+                if item is not None:
+                    to_delete.append(bag_id)
+            elif item is None:
+                to_create.append(CartItem(
+                    cart=cart,
+                    bag_id=bag_id,
+                    quantity=quantity,
+                    price_at_time=bags[bag_id].price
+                ))
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                to_update.append(item)
+
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_delete:
+            cart.items.filter(bag_id__in=to_delete).delete()
+        adjust_cart_totals(cart, total_delta, count_delta)
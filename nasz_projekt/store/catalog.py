@@ -0,0 +1,89 @@
+from .models import Bag, SIZE, COLOR, FABRIC
+
+
+SORT_ORDERINGS = {
+    'id': ('id',),
+    'newest': ('-id',),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+
+DEFAULT_SORT = 'id'
+
+
+class CatalogError(ValueError):
+    pass
+
+
+def _parse_choice(value, choices, name):
+    """Accept either the numeric id or the name of a choice (e.g. 7 or 'blue')."""
+    if value in (None, ''):
+        return None
+    value = str(value).strip()
+    try:
+        value = int(value)
+    except ValueError:
+        try:
+            return choices[value.lower()].value
+        except KeyError:
+            raise CatalogError(f'Unknown {name}: {value}.')
+    if value not in choices.values:
+        raise CatalogError(f'Unknown {name}: {value}.')
+    return value
+
+
+def _parse_price(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except (ValueError, TypeError):
+        value = None
+    if value is None or value < 0:
+        raise CatalogError(f'{name} must be a whole number, 0 or more.')
+    return value
+
+
+def parse_catalog_params(params, size=None):
+    """Validate catalog query parameters, raising CatalogError for bad ones.
+
+    Empty values mean "no filter". `size` pins the size for the
+    size-specific endpoints and wins over `?size=`.
+    """
+    filters = {
+        'size': size if size is not None else _parse_choice(params.get('size'), SIZE, 'size'),
+        'color': _parse_choice(params.get('color'), COLOR, 'color'),
+        'fabric': _parse_choice(params.get('fabric'), FABRIC, 'fabric'),
+        'brand': (params.get('brand') or '').strip() or None,
+        'price_min': _parse_price(params.get('price_min'), 'price_min'),
+        'price_max': _parse_price(params.get('price_max'), 'price_max'),
+    }
+    if (filters['price_min'] is not None and filters['price_max'] is not None
+            and filters['price_min'] > filters['price_max']):
+        raise CatalogError('price_min must not be above price_max.')
+    sort = params.get('sort') or DEFAULT_SORT
+    if sort not in SORT_ORDERINGS:
+        raise CatalogError(f'sort must be one of: {", ".join(SORT_ORDERINGS)}.')
+    filters['sort'] = sort
+    return filters
+
+
+def get_ordering(filters):
+    return SORT_ORDERINGS[filters['sort']]
+
+
+def filter_bags(filters):
+    """Build the catalog queryset for normalized `filters`.
+
+    Every combination maps onto one of the composite indexes declared on
+    `Bag.Meta`, so SQLite never has to scan the whole table.
+    """
+    bags = Bag.objects.all()
+    for field in ('size', 'color', 'fabric', 'brand'):
+        if filters[field] is not None:
+            bags = bags.filter(**{field: filters[field]})
+    if filters['price_min'] is not None:
+        bags = bags.filter(price__gte=filters['price_min'])
+    if filters['price_max'] is not None:
+        bags = bags.filter(price__lte=filters['price_max'])
+    return bags.order_by(*get_ordering(filters))
@@ -0,0 +1,21 @@
+from django.utils.functional import SimpleLazyObject
+
+from .accounts import get_user_acc
+from .models import Cart
+
+
+def cart_badge(request):
+    """Item count for the header cart link.
+
+    Session logins load the cart row along with the user, so this costs no
+    query; other requests read it on first use.
+    """
+    def item_count():
+        if not request.user.is_authenticated:
+            return 0
+        try:
+            return get_user_acc(request).cart.item_count
+        except Cart.DoesNotExist:
+            return 0
+
+    return {'cart_item_count': SimpleLazyObject(item_count)}
@@ -0,0 +1,183 @@
+"""Streaming exports of orders and order summaries.
+
+Rows are produced by generators over `.iterator(chunk_size)` querysets,
+so memory stays bounded by one chunk however much history is exported.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Order, OrderItem, OrderSummary, OrderSummaryItem
+
+
+EXPORT_KINDS = ('orders', 'order_lines', 'summaries')
+EXPORT_FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = ['id', 'user_id', 'email', 'created_at', 'status', 'total_price']
+ORDER_LINE_COLUMNS = [
+    'order_id', 'user_id', 'created_at', 'status',
+    'bag_id', 'brand', 'model_name', 'quantity', 'price_at_time',
+]
+SUMMARY_COLUMNS = [
+    'summary_id', 'user_id', 'email', 'created_at', 'total_price',
+    'bag_id', 'brand', 'model_name', 'quantity', 'price_at_time',
+]
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f'{name} must be a date in YYYY-MM-DD format.')
+
+
+def parse_export_params(params):
+    """Validate export options given as query parameters or command options.
+
+    `start` and `end` are inclusive dates in the current time zone;
+    `status` is a comma-separated list of Order statuses (orders and
+    order_lines only).
+    """
+    kind = params.get('kind') or 'orders'
+    if kind not in EXPORT_KINDS:
+        raise ExportError(f'kind must be one of: {", ".join(EXPORT_KINDS)}.')
+    output = params.get('output') or 'ndjson'
+    if output not in EXPORT_FORMATS:
+        raise ExportError(f'output must be one of: {", ".join(EXPORT_FORMATS)}.')
+
+    start = _parse_date(params.get('start'), 'start')
+    end = _parse_date(params.get('end'), 'end')
+    if start and end and start > end:
+        raise ExportError('start must not be after end.')
+
+    statuses = [s for s in (params.get('status') or '').split(',') if s]
+    invalid = set(statuses) - set(Order.Status.values)
+    if invalid:
+        raise ExportError(f'Unknown status: {", ".join(sorted(invalid))}.')
+    if statuses and kind == 'summaries':
+        raise ExportError('status can only be used with kind=orders or kind=order_lines.')
+
+    return {'kind': kind, 'output': output, 'start': start, 'end': end, 'status': statuses}
+
+
+def _date_range(queryset, start, end):
+    tz = timezone.get_current_timezone()
+    if start:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min), tz))
+    if end:
+        queryset = queryset.filter(
+            created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+        )
+    return queryset
+
+
+def iter_orders(start=None, end=None, status=None):
+    queryset = _date_range(Order.objects.all(), start, end)
+    if status:
+        queryset = queryset.filter(status__in=status)
+    rows = queryset.order_by('id').values_list(
+        'id', 'user_id', 'user__email', 'created_at', 'status', 'total_price'
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        record = dict(zip(ORDER_COLUMNS, row))
+        record['created_at'] = record['created_at'].isoformat()
+        yield record
+
+
+def iter_order_lines(start=None, end=None, status=None):
+    """One record per order line, read with a join rather than a prefetch."""
+    queryset = _date_range(Order.objects.all(), start, end)
+    if status:
+        queryset = queryset.filter(status__in=status)
+    rows = OrderItem.objects.filter(order__in=queryset).order_by('order_id', 'id').values_list(
+        'order_id', 'order__user_id', 'order__created_at', 'order__status',
+        'bag_id', 'bag__brand', 'bag__model_name', 'quantity', 'price_at_time'
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        record = dict(zip(ORDER_LINE_COLUMNS, row))
+        record['created_at'] = record['created_at'].isoformat()
+        yield record
+
+
+def iter_summaries(start=None, end=None):
+    queryset = (
+        _date_range(OrderSummary.objects.all(), start, end)
+        .select_related('user')
+        .only('id', 'user_id', 'user__email', 'created_at', 'total_price')
+        .prefetch_related(Prefetch(
+            'items',
+            queryset=OrderSummaryItem.objects.select_related('bag').only(
+                'summary_id', 'bag_id', 'bag__brand', 'bag__model_name', 'quantity', 'price_at_time'
+            ).order_by('id')
+        ))
+        .order_by('id')
+    )
+    for summary in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'id': summary.id,
+            'user_id': summary.user_id,
+            'email': summary.user.email,
+            'created_at': summary.created_at.isoformat(),
+            'total_price': summary.total_price,
+            'lines': [
+                {
+                    'bag_id': item.bag_id,
+                    'brand': item.bag.brand,
+                    'model_name': item.bag.model_name,
+                    'quantity': item.quantity,
+                    'price_at_time': item.price_at_time,
+                }
+                for item in summary.items.all()
+            ],
+        }
+
+
+class _Echo:
+    """File-like object whose write() just hands the line back to csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(kind, records):
+    writer = csv.writer(_Echo())
+    if kind in ('orders', 'order_lines'):
+        columns = ORDER_COLUMNS if kind == 'orders' else ORDER_LINE_COLUMNS
+        yield writer.writerow(columns)
+        for record in records:
+            yield writer.writerow([record[column] for column in columns])
+        return
+
+    yield writer.writerow(SUMMARY_COLUMNS)
+    for record in records:
+        head = [record['id'], record['user_id'], record['email'], record['created_at'], record['total_price']]
+        for line in record['lines']:
+            yield writer.writerow(head + [
+                line['bag_id'], line['brand'], line['model_name'], line['quantity'], line['price_at_time']
+            ])
+
+
+def export_lines(options):
+    """Yield the export described by parse_export_params() as text lines."""
+    if options['kind'] == 'orders':
+        records = iter_orders(options['start'], options['end'], options['status'])
+    elif options['kind'] == 'order_lines':
+        records = iter_order_lines(options['start'], options['end'], options['status'])
+    else:
+        records = iter_summaries(options['start'], options['end'])
+
+    if options['output'] == 'csv':
+        yield from _csv_lines(options['kind'], records)
+    else:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,85 @@
+import logging
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'bag_photos/variants'
+VARIANT_WIDTHS = (200, 400, 800)
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+def variant_name(photo_name, width, fmt):
+    """Variants live in a directory named after the photo's full storage name,
+    which the storage keeps unique, so two photos never share a variant."""
+    extension = VARIANT_FORMATS[fmt][1]
+    return f'{VARIANT_DIR}/{photo_name}/{width}.{extension}'
+
+
+def variant_urls(photo_name):
+    """Map of format -> width -> URL, ready to be joined into a srcset."""
+    return {
+        fmt: {
+            str(width): default_storage.url(variant_name(photo_name, width, fmt))
+            for width in VARIANT_WIDTHS
+        }
+        for fmt in VARIANT_FORMATS
+    }
+
+
+def _flatten(image):
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(photo_name, force=False):
+    """Write the resized JPEG and WebP variants of a stored photo.
+
+    Variants that already exist are left alone unless `force` is set.
+    Returns the names of the files that were written.
+    """
+    targets = [
+        (width, fmt, variant_name(photo_name, width, fmt))
+        for width in VARIANT_WIDTHS
+        for fmt in VARIANT_FORMATS
+    ]
+    if not force:
+        targets = [t for t in targets if not default_storage.exists(t[2])]
+    if not targets:
+        return []
+
+    with default_storage.open(photo_name, 'rb') as f:
+        original = _flatten(Image.open(f))
+
+    written = []
+    for width, fmt, name in targets:
+        image = original.copy()
+        image.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+        pil_format, _, options = VARIANT_FORMATS[fmt]
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        written.append(default_storage.save(name, ContentFile(buffer.getvalue())))
+    return written
+
+
+def generate_variants_safely(photo_name, force=False):
+    """Like generate_variants, but logs unreadable photos instead of raising."""
+    try:
+        return generate_variants(photo_name, force=force)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('Could not generate variants for %s: %s', photo_name, e)
+        return []
@@ -0,0 +1,288 @@
+"""Bulk import of bags from CSV or NDJSON.
+
+Rows are validated in batches with BagSerializer's rules and upserted by
+(brand, model_name) with one INSERT ... ON CONFLICT DO UPDATE per batch.
+"""
+import csv
+import io
+import json
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.validators import ProhibitNullCharactersValidator
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .caching import bump_catalog_version
+from .models import Bag, SIZE, COLOR, FABRIC
+from .serializers import BagSerializer
+
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+BATCH_SIZE = 1000
+PHOTO_DIR = 'bag_photos'
+IMPORT_FIELDS = ['brand', 'model_name', 'size', 'color', 'fabric', 'price', 'amount']
+UPSERT_FIELDS = ['size', 'color', 'fabric', 'price', 'amount']
+TEXT_FIELDS = {name: Bag._meta.get_field(name).max_length for name in ('brand', 'model_name')}
+INTEGER_FIELDS = ('price', 'amount')
+# Lower-cased choice names and the string form of their ids, both mapped to the id.
+CHOICE_VALUES = {
+    field: {
+        **{str(value): value for value in choices.values},
+        **{name: choices[name].value for name in choices.names},
+    }
+    for field, choices in (('size', SIZE), ('color', COLOR), ('fabric', FABRIC))
+}
+# What DRF's IntegerField strips before int(): "12.0" is 12.
+DECIMAL_ZEROS = re.compile(r'\.0*\s*$')
+
+MESSAGES = {
+    'required': serializers.Field.default_error_messages['required'],
+    'null': serializers.Field.default_error_messages['null'],
+    'text': serializers.CharField.default_error_messages['invalid'],
+    'blank': serializers.CharField.default_error_messages['blank'],
+    'max_length': serializers.CharField.default_error_messages['max_length'],
+    'null_characters': ProhibitNullCharactersValidator.message,
+    'integer': serializers.IntegerField.default_error_messages['invalid'],
+    'min_value': serializers.IntegerField.default_error_messages['min_value'],
+    'max_value': serializers.IntegerField.default_error_messages['max_value'],
+    'choice': serializers.ChoiceField.default_error_messages['invalid_choice'],
+}
+
+
+def import_batch_size():
+    return getattr(settings, 'STORE_IMPORT_BATCH_SIZE', BATCH_SIZE)
+
+
+def format_for(filename, default='csv'):
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    return extension if extension in IMPORT_FORMATS else default
+
+
+def read_rows(stream, file_format):
+    """Yield (row number, dict) from a text stream; row numbers are 1-based data rows."""
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), 1):
+            yield number, {k.strip(): v for k, v in row.items() if k}
+        return
+
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'__error__': f'Invalid JSON: {e}'}
+        if not isinstance(row, dict):
+            row = {'__error__': 'Each line must be a JSON object.'}
+        yield number, row
+
+
+def _message(key, **params):
+    return str(MESSAGES[key]).format(**params)
+
+
+def _normalize(row):
+    row = {k: v.strip() if isinstance(v, str) else v for k, v in row.items()}
+    for field in CHOICE_VALUES:
+        if row.get(field) in ('', None):
+            row.pop(field, None)
+    return row
+
+
+class BagImporter:
+    """Validate and upsert rows batch by batch; collect per-row errors.
+
+    Photos named in a `photo` column are looked up in `photos_dir` and
+    copied into media storage. Call finish() once all rows are fed in.
+    """
+
+    def __init__(self, photos_dir=None, dry_run=False, batch_size=None):
+        self.photos_dir = photos_dir
+        self.dry_run = dry_run
+        self.batch_size = batch_size or import_batch_size()
+        self.imported = 0
+        self.errors = []
+        self.photos = []
+        serializer = BagSerializer()
+        self.field_validators = {
+            name: getattr(serializer, f'validate_{name}')
+            for name in IMPORT_FIELDS if hasattr(serializer, f'validate_{name}')
+        }
+        self.max_integer = connection.ops.integer_field_range('PositiveIntegerField')[1]
+
+    def run(self, rows):
+        batch = []
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self
+
+    def finish(self):
+        """Bump the catalog version; return the photo names needing variants."""
+        if self.imported and not self.dry_run:
+            bump_catalog_version()
+        return self.photos
+
+    def _error(self, number, errors):
+        self.errors.append({'row': number, 'errors': errors})
+
+    def _photo(self, number, name):
+        if not self.photos_dir:
+            self._error(number, {'photo': ['Photos can only be imported with manage.py import_bags --photos-dir.']})
+            return None
+        path = os.path.join(self.photos_dir, os.path.basename(name))
+        if not os.path.isfile(path):
+            self._error(number, {'photo': [f'File not found: {name}']})
+            return None
+        return path
+
+    def _import_batch(self, batch):
+        rows, numbers, photos = [], [], []
+        for number, row in batch:
+            if '__error__' in row:
+                self._error(number, {'non_field_errors': [row['__error__']]})
+                continue
+            photo = row.pop('photo', None)
+            photo_path = None
+            if photo:
+                photo_path = self._photo(number, photo)
+                if photo_path is None:
+                    continue
+            rows.append(_normalize(row))
+            numbers.append(number)
+            photos.append(photo_path)
+
+        valid = {}
+        for number, row, photo_path in zip(numbers, rows, photos):
+            data, errors = self._validate(row)
+            if errors:
+                self._error(number, errors)
+                continue
+            key = (data['brand'], data['model_name'])
+            if key in valid:
+                self._error(valid[key][0], {'non_field_errors': [
+                    f'Superseded by row {number} with the same brand and model_name.'
+                ]})
+            valid[key] = (number, data, photo_path)
+
+        if not valid or self.dry_run:
+            self.imported += len(valid)
+            return
+
+        plain, with_photo = [], []
+        for number, data, photo_path in valid.values():
+            bag = Bag(**data)
+            if photo_path:
+                bag.photo = self._store_photo(photo_path)
+                with_photo.append(bag)
+            else:
+                plain.append(bag)
+
+        with transaction.atomic():
+            for bags, fields in ((plain, UPSERT_FIELDS), (with_photo, UPSERT_FIELDS + ['photo'])):
+                if bags:
+                    Bag.objects.bulk_create(
+                        bags,
+                        update_conflicts=True,
+                        unique_fields=['brand', 'model_name'],
+                        update_fields=fields
+                    )
+        self.photos.extend(bag.photo.name for bag in with_photo)
+        self.imported += len(valid)
+
+    def _validate(self, row):
+        """(data, errors) for one normalized row.
+
+        Applies the same checks, and reports the same messages, as running
+        BagSerializer over the row, but against the precomputed TEXT_FIELDS,
+        INTEGER_FIELDS and CHOICE_VALUES instead of building DRF fields and
+        validators for every row; only BagSerializer's validate_<field>
+        methods are called. The unique (brand, model_name) check is left
+        out: rows are upserts.
+        """
+        data, errors = {}, {}
+        for name, max_length in TEXT_FIELDS.items():
+            value = row.get(name)
+            if name not in row:
+                errors[name] = [_message('required')]
+            elif value is None:
+                errors[name] = [_message('null')]
+            elif isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                errors[name] = [_message('text')]
+            elif not str(value).strip():
+                errors[name] = [_message('blank')]
+            else:
+                data[name] = str(value).strip()
+                field_errors = []
+                if len(data[name]) > max_length:
+                    field_errors.append(_message('max_length', max_length=max_length))
+                if '\x00' in data[name]:
+                    field_errors.append(_message('null_characters'))
+                if field_errors:
+                    errors[name] = field_errors
+
+        for name, values in CHOICE_VALUES.items():
+            if name in row:
+                value = values.get(str(row[name]).lower())
+                if value is None:
+                    errors[name] = [_message('choice', input=row[name])]
+                else:
+                    data[name] = value
+
+        for name in INTEGER_FIELDS:
+            value = row.get(name)
+            if name not in row:
+                errors[name] = [_message('required')]
+                continue
+            if value is None:
+                errors[name] = [_message('null')]
+                continue
+            try:
+                value = int(DECIMAL_ZEROS.sub('', str(value)))
+            except ValueError:
+                errors[name] = [_message('integer')]
+                continue
+            if value < 0:
+                errors[name] = [_message('min_value', min_value=0)]
+            elif value > self.max_integer:
+                errors[name] = [_message('max_value', max_value=self.max_integer)]
+            else:
+                data[name] = value
+
+        for name, validate in self.field_validators.items():
+            if name not in data:
+                continue
+            try:
+                data[name] = validate(data[name])
+            except serializers.ValidationError as e:
+                errors[name] = [str(message) for message in e.detail]
+                del data[name]
+
+        # Report fields in BagSerializer's order, as its errors would be.
+        errors = {name: errors[name] for name in IMPORT_FIELDS if name in errors}
+        return data, errors
+
+    def _store_photo(self, path):
+        with open(path, 'rb') as f:
+            return default_storage.save(f'{PHOTO_DIR}/{os.path.basename(path)}', File(f))
+
+
+def import_bags(stream, file_format, **options):
+    """Import a whole text stream; returns the finished BagImporter."""
+    importer = BagImporter(**options).run(read_rows(stream, file_format))
+    importer.finish()
+    return importer
+
+
+def text_stream(binary):
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
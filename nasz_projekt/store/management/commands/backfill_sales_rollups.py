@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from store.models import Order
+from store.reporting import orders_without_lines, rebuild_days
+
+
+def _date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'--{name} must be a date in YYYY-MM-DD format.')
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the daily sales rollups from order lines, a few days per "
+        "transaction. Rebuilt days are replaced, so the command can be re-run "
+        "after an interruption or to repair a range. Orders placed before order "
+        "lines were recorded have no lines to rebuild from; the command refuses "
+        "ranges containing them unless --allow-orders-without-lines is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild, YYYY-MM-DD (default: day of the first order line).')
+        parser.add_argument('--end', help='Last day to rebuild, YYYY-MM-DD (default: day of the last order).')
+        parser.add_argument('--chunk-days', type=int, default=7,
+                            help='Days rebuilt per transaction (default: 7).')
+        parser.add_argument('--allow-orders-without-lines', action='store_true',
+                            help='Rebuild even if orders in the range have no lines; they are left out of the rollups.')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be positive.')
+
+        bounds = Order.objects.filter(items__isnull=False).aggregate(
+            first=Min('created_at'), last=Max('created_at')
+        )
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write('No order lines; nothing to rebuild.')
+            return
+        start = _date(options['start'], 'start') if options['start'] else timezone.localdate(bounds['first'])
+        end = _date(options['end'], 'end') if options['end'] else timezone.localdate(bounds['last'])
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        unlined = orders_without_lines(start, end).count()
+        if unlined and not options['allow_orders_without_lines']:
+            raise CommandError(
+                f'{unlined} order(s) between {start} and {end} have no order lines, so rebuilding '
+                'would leave them out of the rollups. Pick a later --start, or pass '
+                '--allow-orders-without-lines to rebuild anyway.'
+            )
+        if unlined:
+            self.stderr.write(self.style.WARNING(f'{unlined} order(s) without lines left out of the rollups.'))
+
+        total_days = (end - start).days + 1
+        days_with_sales = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), end)
+            days_with_sales += rebuild_days(chunk_start, chunk_end)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Rebuilt {chunk_start}..{chunk_end}: {(chunk_end - start).days + 1}/{total_days} days')
+            chunk_start = chunk_end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_days} day(s) from {start} to {end}; {days_with_sales} with sales.'
+        ))
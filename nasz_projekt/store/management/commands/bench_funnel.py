@@ -0,0 +1,201 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from store.middleware import QueryRecorder
+from store.models import Bag, SIZE, COLOR, FABRIC
+
+
+CHECKOUT_DATA = {
+    'name': 'Anna',
+    'surname': 'Nowak',
+    'email': 'anna@example.com',
+    'street_name': 'Polna',
+    'home_nr': '1',
+    'city': 'Warszawa',
+    'zip_code': '00-001',
+    'country': 'PL',
+    'phone_number': '+48123456789',
+}
+
+
+# Cached steps (browse, catalog API) miss a little more or less often from run
+# to run as concurrent shoppers race to fill the same cache keys, so their
+# queries per request drift by a tenth or two; a real regression adds at least
+# one query per request.
+QUERY_NOISE = 0.25
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the shopping funnel (browse, catalog API, add to cart, cart, "
+        "checkout, order summary) through the Django test client against a "
+        "throwaway database and report latency, throughput and queries per "
+        "request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=50,
+                            help='Number of funnels to run (default: 50).')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Funnels running at the same time (default: 4).')
+        parser.add_argument('--bags', type=int, default=500,
+                            help='Catalog size (default: 500).')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--baseline', help='Compare against a previous JSON report.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed p95 / throughput regression vs. the baseline (default: 0.2).')
+
+    def handle(self, *args, **options):
+        if options['shoppers'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--shoppers and --concurrency must be positive.')
+
+        setup_test_environment()
+        db_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = db_file
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users, bags = self.seed(options['shoppers'], options['bags'])
+            cache.clear()
+            report = self.run(users, bags, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if os.path.exists(db_file):
+                os.remove(db_file)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def seed(self, shoppers, bag_count):
+        Bag.objects.bulk_create([
+            Bag(
+                brand=f'Brand {i % 25}',
+                model_name=f'Model {i}',
+                size=SIZE.values[i % len(SIZE.values)],
+                color=COLOR.values[i % len(COLOR.values)],
+                fabric=FABRIC.values[i % len(FABRIC.values)],
+                price=500 + (i * 37) % 5000,
+                amount=1_000_000,
+            )
+            for i in range(bag_count)
+        ])
+        password = make_password('bench-password')
+        users = []
+        for i in range(shoppers):
+            users.append(User.objects.create(username=f'shopper{i}', password=password))
+        return users, list(Bag.objects.values_list('id', flat=True))
+
+    def funnel(self, user, bag_id, samples, lock):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        steps = [
+            ('browse', 'get', reverse('store:main-page'), None),
+            ('catalog_api', 'get', reverse('store:api-bags-list'), None),
+            ('bag_detail', 'get', reverse('store:bag-detail-html', args=[bag_id]), None),
+            ('add_to_cart', 'post', reverse('store:bag-detail-html', args=[bag_id]), {'quantity': 1}),
+            ('cart', 'get', reverse('store:cart'), None),
+            ('checkout_form', 'get', reverse('store:checkout'), None),
+            ('order_summary', 'get', reverse('store:order-summary'), None),
+            ('checkout', 'post', reverse('store:checkout'), CHECKOUT_DATA),
+        ]
+        for name, method, url, data in steps:
+            with QueryRecorder() as recorder:
+                start = time.perf_counter()
+                response = getattr(client, method)(url, data) if data else getattr(client, method)(url)
+                elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append((elapsed, recorder.count, response.status_code >= 400))
+        connections.close_all()
+
+    def run(self, users, bags, options):
+        samples = defaultdict(list)
+        lock = threading.Lock()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            futures = [
+                pool.submit(self.funnel, user, bags[i % len(bags)], samples, lock)
+                for i, user in enumerate(users)
+            ]
+            for future in futures:
+                future.result()
+        duration = time.perf_counter() - start
+
+        steps = {}
+        all_latencies = []
+        for name, rows in samples.items():
+            latencies = [row[0] * 1000 for row in rows]
+            all_latencies.extend(latencies)
+            steps[name] = {
+                'requests': len(rows),
+                'errors': sum(1 for row in rows if row[2]),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'queries_per_request': round(sum(row[1] for row in rows) / len(rows), 2),
+            }
+        return {
+            'config': {
+                'shoppers': options['shoppers'],
+                'concurrency': options['concurrency'],
+                'bags': options['bags'],
+            },
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(len(all_latencies) / duration, 2),
+            'p50_ms': round(percentile(all_latencies, 50), 3),
+            'p95_ms': round(percentile(all_latencies, 95), 3),
+            'p99_ms': round(percentile(all_latencies, 99), 3),
+            'steps': steps,
+        }
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        if report['throughput_rps'] < baseline['throughput_rps'] * (1 - tolerance):
+            regressions.append(
+                f"throughput {report['throughput_rps']} rps < baseline {baseline['throughput_rps']} rps"
+            )
+        for name, step in report['steps'].items():
+            previous = baseline['steps'].get(name)
+            if previous is None:
+                continue
+            if step['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {step['p95_ms']} ms > baseline {previous['p95_ms']} ms")
+            if step['queries_per_request'] > previous['queries_per_request'] + QUERY_NOISE:
+                regressions.append(
+                    f"{name}: {step['queries_per_request']} queries/request > "
+                    f"baseline {previous['queries_per_request']}"
+                )
+
+        if regressions:
+            raise CommandError('Regressions against baseline:\n  ' + '\n  '.join(regressions))
+        self.stderr.write(self.style.SUCCESS('No regressions against baseline.'))
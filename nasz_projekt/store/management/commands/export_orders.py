@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import EXPORT_FORMATS, EXPORT_KINDS, ExportError, export_lines, parse_export_params
+
+
+class Command(BaseCommand):
+    help = "Stream orders, order lines or order summaries with their lines as NDJSON or CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=EXPORT_KINDS, default='orders',
+                            help='orders, order_lines, or summaries with their lines (default: orders).')
+        parser.add_argument('--format', dest='output', choices=EXPORT_FORMATS, default='ndjson',
+                            help='Output format (default: ndjson).')
+        parser.add_argument('--start', help='First day to include, YYYY-MM-DD.')
+        parser.add_argument('--end', help='Last day to include, YYYY-MM-DD.')
+        parser.add_argument('--status', help='Comma-separated order statuses (orders and order_lines only).')
+        parser.add_argument('--output', dest='path', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        try:
+            export = parse_export_params(options)
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        if options['path']:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(export_lines(export))
+        else:
+            for line in export_lines(export):
+                self.stdout.write(line, ending='')
@@ -0,0 +1,51 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.images import generate_variants_safely
+from store.models import Bag
+
+
+class Command(BaseCommand):
+    help = "Generate resized JPEG/WebP variants for existing bag photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: number of CPUs).'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist.'
+        )
+
+    def handle(self, *args, **options):
+        photos = sorted(set(
+            Bag.objects.exclude(photo='').exclude(photo__isnull=True)
+            .values_list('photo', flat=True)
+        ))
+        if not photos:
+            self.stdout.write('No photos to process.')
+            return
+
+        # Workers only touch the media storage; don't let them inherit
+        # an open database connection.
+        connections.close_all()
+
+        generate = partial(generate_variants_safely, force=options['force'])
+        written = 0
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+            for photo, files in zip(photos, pool.map(generate, photos, chunksize=4)):
+                written += len(files)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{photo}: {len(files)} variant(s) written')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(photos)} photo(s), wrote {written} variant file(s).'
+        ))
@@ -0,0 +1,67 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.images import generate_variants_safely
+from store.imports import IMPORT_FORMATS, BagImporter, format_for, import_batch_size, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert bags from a CSV or NDJSON file, matching existing bags by "
+        "(brand, model_name). Invalid rows are skipped and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS,
+                            help='File format (default: guessed from the extension).')
+        parser.add_argument('--photos-dir', help='Directory holding the files named in the photo column.')
+        parser.add_argument('--errors', help='Write the per-row error report (NDJSON) to this file.')
+        parser.add_argument('--batch-size', type=int, default=import_batch_size(),
+                            help='Rows validated and upserted per query (default: STORE_IMPORT_BATCH_SIZE).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes generating photo variants (default: number of CPUs).')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        if options['photos_dir'] and not os.path.isdir(options['photos_dir']):
+            raise CommandError(f'{options["photos_dir"]} is not a directory.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        importer = BagImporter(
+            photos_dir=options['photos_dir'],
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size']
+        )
+        file_format = options['file_format'] or format_for(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                importer.run(read_rows(f, file_format))
+        except OSError as e:
+            raise CommandError(str(e))
+        photos = importer.finish()
+
+        if photos:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=max(options['workers'], 1)) as pool:
+                list(pool.map(generate_variants_safely, photos, chunksize=4))
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as f:
+                for error in importer.errors:
+                    f.write(json.dumps(error, ensure_ascii=False) + '\n')
+        elif options['verbosity'] > 1:
+            for error in importer.errors:
+                self.stderr.write(json.dumps(error, ensure_ascii=False))
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        message = f'{verb} {importer.imported} bag(s); {len(importer.errors)} row(s) with errors.'
+        if importer.errors:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,71 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from store.imports import IMPORT_FORMATS, format_for, read_rows
+from store.provisioning import BATCH_SIZE, UserProvisioner
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users, their accounts and API tokens from a CSV or NDJSON file "
+        "(columns: username, email, password and optionally name, surname, "
+        "street_name, home_nr, city, zip_code, country, phone_number). "
+        "Passwords are hashed in a process pool; rows are bulk-inserted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file with one user per row.')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS,
+                            help='File format (default: guessed from the extension).')
+        parser.add_argument('--errors', help='Write the per-row error report (NDJSON) to this file.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Rows validated and inserted per transaction (default: {BATCH_SIZE}).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes hashing passwords (default: number of CPUs).')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        workers = max(options['workers'], 1)
+        file_format = options['file_format'] or format_for(options['path'])
+        start = time.perf_counter()
+
+        # Workers only hash; they must not inherit open database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            provisioner = UserProvisioner(
+                dry_run=options['dry_run'],
+                batch_size=options['batch_size'],
+                hash_map=partial(pool.map, chunksize=max(1, options['batch_size'] // (workers * 4)))
+            )
+            try:
+                with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                    provisioner.run(read_rows(f, file_format))
+            except OSError as e:
+                raise CommandError(str(e))
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as f:
+                for error in provisioner.errors:
+                    f.write(json.dumps(error, ensure_ascii=False) + '\n')
+        elif options['verbosity'] > 1:
+            for error in provisioner.errors:
+                self.stderr.write(json.dumps(error, ensure_ascii=False))
+
+        verb = 'Validated' if options['dry_run'] else 'Created'
+        message = (
+            f'{verb} {provisioner.created} user(s); {len(provisioner.errors)} row(s) with errors '
+            f'({time.perf_counter() - start:.1f}s).'
+        )
+        if provisioner.errors:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the bag full-text search triggers and reindex all bags."
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
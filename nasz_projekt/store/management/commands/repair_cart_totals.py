@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.carts import carts_with_drift
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = "Find carts whose stored total_price/item_count disagree with their items and fix them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report the drifted carts.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Carts updated per query (default: 1000).'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = list(carts_with_drift().only('id', 'total_price', 'item_count'))
+            for cart in drifted:
+                if options['verbosity'] > 1 or options['dry_run']:
+                    self.stdout.write(
+                        f'Cart {cart.id}: stored {cart.total_price} zł / {cart.item_count} item(s), '
+                        f'actual {cart.actual_total} zł / {cart.actual_count} item(s)'
+                    )
+                cart.total_price = cart.actual_total
+                cart.item_count = cart.actual_count
+
+            if not options['dry_run']:
+                Cart.objects.bulk_update(
+                    drifted, ['total_price', 'item_count'], batch_size=options['batch_size']
+                )
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} cart(s) with drifted totals.'))
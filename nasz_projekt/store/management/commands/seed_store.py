@@ -0,0 +1,262 @@
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from store.caching import bump_catalog_version
+from store.models import (
+    Bag, User_acc, Cart, CartItem, Order, OrderItem, OrderSummary, OrderSummaryItem,
+    SIZE, COLOR, FABRIC,
+)
+
+
+BRANDS = [
+    'Gucci', 'Prada', 'Chanel', 'Hermes', 'Dior', 'Fendi', 'Celine', 'Loewe',
+    'Coach', 'Michael Kors', 'Furla', 'Wittchen', 'Ochnik', 'Kazar', 'Zara',
+    'Mango', 'Reserved', 'Guess', 'Tommy Hilfiger', 'Calvin Klein',
+]
+MODEL_WORDS = [
+    'Marmont', 'Classic', 'Tote', 'Shopper', 'Hobo', 'Saddle', 'Bucket',
+    'Clutch', 'Messenger', 'Baguette', 'Box', 'Crossbody', 'Satchel', 'Pouch',
+]
+
+# Relative weights, in the order of the choices in store.models.
+SIZE_WEIGHTS = {'mini': 3, 'midi': 5, 'maxi': 2}
+COLOR_WEIGHTS = {
+    'beige': 12, 'white': 6, 'brown': 14, 'black': 25, 'red': 5, 'purple': 2,
+    'blue': 4, 'orange': 1, 'pink': 4, 'gold': 2, 'silver': 2, 'grey': 8,
+    'green': 3, 'yellow': 1, 'mixed': 11,
+}
+FABRIC_WEIGHTS = {
+    'natural_leather': 35, 'vegan_leather': 25, 'cotton': 8, 'nylon': 12,
+    'vinyl': 5, 'jute': 3, 'canvas': 12,
+}
+# Median price in zł per fabric; prices are log-normal around it.
+FABRIC_MEDIAN_PRICE = {
+    'natural_leather': 1200, 'vegan_leather': 350, 'cotton': 120, 'nylon': 250,
+    'vinyl': 300, 'jute': 90, 'canvas': 180,
+}
+SIZE_PRICE_FACTOR = {'mini': 0.8, 'midi': 1.0, 'maxi': 1.25}
+
+MIN_PRICE = 49
+MAX_PRICE = 50_000
+
+
+def _weighted(choices, weights):
+    values = [choices[name] for name in choices.names]
+    return values, [weights[name] for name in choices.names]
+
+
+@contextmanager
+def explicit_created_at(*models):
+    """Let bulk_create keep preset `created_at` values instead of now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    try:
+        for field in fields:
+            field.auto_now_add = False
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic bags, users, carts, orders and order "
+        "summaries for scale testing. Rows are bulk-inserted in chunks and the "
+        "per-user post_save signal is bypassed. Run backfill_sales_rollups "
+        "afterwards to include the orders in the sales reports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bags', type=int, default=10_000,
+                            help='Number of bags to create (default: 10000).')
+        parser.add_argument('--users', type=int, default=10_000,
+                            help='Number of users (with account and token) to create (default: 10000).')
+        parser.add_argument('--carts', type=float, default=0.3,
+                            help='Fraction of the new users that get a non-empty cart (default: 0.3).')
+        parser.add_argument('--orders', type=int, default=20_000,
+                            help='Number of orders (and order summaries) to create (default: 20000).')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread order dates over this many past days (default: 365).')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows per bulk insert transaction (default: 5000).')
+        parser.add_argument('--password', default='seed-password',
+                            help='Password shared by all generated users.')
+        parser.add_argument('--seed', type=int, help='Random seed, for reproducible data.')
+
+    def handle(self, *args, **options):
+        for name in ('bags', 'users', 'orders', 'days', 'chunk_size'):
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} must not be negative.')
+        if not 0 <= options['carts'] <= 1:
+            raise CommandError('--carts must be between 0 and 1.')
+        if options['chunk_size'] == 0:
+            raise CommandError('--chunk-size must be positive.')
+
+        self.rng = random.Random(options['seed'])
+        # Tags usernames and model names so repeated runs don't collide.
+        self.run_id = uuid.uuid4().hex[:8]
+        self.chunk_size = options['chunk_size']
+        self.verbosity = options['verbosity']
+        start = time.perf_counter()
+
+        self.create_bags(options['bags'])
+        prices = dict(Bag.objects.values_list('id', 'price').iterator())
+        bag_ids = list(prices)
+
+        account_ids = self.create_users(options['users'], options['password'])
+        if account_ids and bag_ids:
+            self.create_carts(self.rng.sample(account_ids, round(len(account_ids) * options['carts'])), bag_ids, prices)
+        if options['orders']:
+            if not account_ids:
+                account_ids = list(User_acc.objects.values_list('id', flat=True))
+            if not account_ids or not bag_ids:
+                raise CommandError('Orders need at least one user account and one bag.')
+            self.create_orders(options['orders'], options['days'], account_ids, bag_ids, prices)
+
+        if options['bags']:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.1f}s.'))
+
+    def report(self, label, done, total):
+        if self.verbosity > 1 or done == total:
+            self.stdout.write(f'{label}: {done}/{total}')
+
+    def create_bags(self, total):
+        sizes, size_weights = _weighted(SIZE, SIZE_WEIGHTS)
+        colors, color_weights = _weighted(COLOR, COLOR_WEIGHTS)
+        fabrics, fabric_weights = _weighted(FABRIC, FABRIC_WEIGHTS)
+        rng = self.rng
+
+        for offset, count in chunks(total, self.chunk_size):
+            bags = []
+            size_values = rng.choices(sizes, size_weights, k=count)
+            fabric_values = rng.choices(fabrics, fabric_weights, k=count)
+            color_values = rng.choices(colors, color_weights, k=count)
+            for i, (size, color, fabric) in enumerate(zip(size_values, color_values, fabric_values)):
+                median = FABRIC_MEDIAN_PRICE[FABRIC(fabric).name] * SIZE_PRICE_FACTOR[SIZE(size).name]
+                price = round(rng.lognormvariate(0, 0.5) * median)
+                bags.append(Bag(
+                    brand=rng.choice(BRANDS),
+                    model_name=f'{rng.choice(MODEL_WORDS)} {self.run_id}-{offset + i}',
+                    size=size,
+                    color=color,
+                    fabric=fabric,
+                    price=min(max(price, MIN_PRICE), MAX_PRICE),
+                    amount=rng.choice([0, 1, 2, 3, 5, 8, 10, 20, 50]),
+                ))
+            Bag.objects.bulk_create(bags)
+            self.report('Bags', offset + count, total)
+
+    def create_users(self, total, password):
+        # Hashing is deliberately slow, so every user shares one hash.
+        hashed = make_password(password)
+        prefix = f'seed-{self.run_id}'
+        rng = self.rng
+
+        account_ids = []
+        for offset, count in chunks(total, self.chunk_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}-{offset + i}', password=hashed,
+                         email=f'{prefix}-{offset + i}@example.com')
+                    for i in range(count)
+                ])
+                accounts = User_acc.objects.bulk_create([
+                    User_acc(
+                        django_user=user,
+                        name=user.username,
+                        surname=user.username,
+                        email=user.email,
+                        street_name=f'Street {rng.randint(1, 500)}',
+                        home_nr=str(rng.randint(1, 200)),
+                        city=rng.choice(['Warszawa', 'Kraków', 'Gdańsk', 'Wrocław', 'Poznań', 'Łódź']),
+                        zip_code=f'{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}',
+                        country='PL',
+                        phone_number=f'+48{rng.randint(500_000_000, 899_999_999)}',
+                    )
+                    for user in users
+                ])
+                Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+            account_ids.extend(account.id for account in accounts)
+            self.report('Users', offset + count, total)
+        return account_ids
+
+    def pick_lines(self, bag_ids, prices):
+        count = min(len(bag_ids), self.rng.choices([1, 2, 3, 4], [50, 30, 15, 5])[0])
+        return [
+            (bag_id, self.rng.choices([1, 2, 3], [85, 12, 3])[0], prices[bag_id])
+            for bag_id in self.rng.sample(bag_ids, count)
+        ]
+
+    def create_carts(self, account_ids, bag_ids, prices):
+        total = len(account_ids)
+        for offset, count in chunks(total, self.chunk_size):
+            lines = [self.pick_lines(bag_ids, prices) for _ in range(count)]
+            with transaction.atomic():
+                carts = Cart.objects.bulk_create([
+                    Cart(
+                        user_cart_id=account_id,
+                        total_price=sum(quantity * price for _, quantity, price in cart_lines),
+                        item_count=sum(quantity for _, quantity, _ in cart_lines),
+                    )
+                    for account_id, cart_lines in zip(account_ids[offset:offset + count], lines)
+                ])
+                CartItem.objects.bulk_create([
+                    CartItem(cart=cart, bag_id=bag_id, quantity=quantity, price_at_time=price)
+                    for cart, cart_lines in zip(carts, lines)
+                    for bag_id, quantity, price in cart_lines
+                ])
+            self.report('Carts', offset + count, total)
+
+    def create_orders(self, total, days, account_ids, bag_ids, prices):
+        statuses = [Order.Status.NEW, Order.Status.SENT, Order.Status.DONE, Order.Status.CANCELED]
+        status_weights = [10, 15, 70, 5]
+        now = timezone.now()
+        rng = self.rng
+
+        with explicit_created_at(Order, OrderSummary):
+            for offset, count in chunks(total, self.chunk_size):
+                orders, summaries, lines = [], [], []
+                for _ in range(count):
+                    account_id = rng.choice(account_ids)
+                    created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+                    order_lines = self.pick_lines(bag_ids, prices)
+                    total_price = sum(quantity * price for _, quantity, price in order_lines)
+                    orders.append(Order(
+                        user_id=account_id, created_at=created_at, total_price=total_price,
+                        status=rng.choices(statuses, status_weights)[0],
+                    ))
+                    summaries.append(OrderSummary(
+                        user_id=account_id, created_at=created_at, total_price=total_price,
+                    ))
+                    lines.append(order_lines)
+
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    OrderItem.objects.bulk_create([
+                        OrderItem(order=order, bag_id=bag_id, quantity=quantity, price_at_time=price)
+                        for order, order_lines in zip(orders, lines)
+                        for bag_id, quantity, price in order_lines
+                    ])
+                    OrderSummary.objects.bulk_create(summaries)
+                    OrderSummaryItem.objects.bulk_create([
+                        OrderSummaryItem(summary=summary, bag_id=bag_id, quantity=quantity, price_at_time=price)
+                        for summary, order_lines in zip(summaries, lines)
+                        for bag_id, quantity, price in order_lines
+                    ])
+                self.report('Orders', offset + count, total)
@@ -0,0 +1,151 @@
+"""In-process Prometheus metrics.
+
+Each worker process keeps its own counters in memory and snapshots them
+to `<STORE_METRICS_DIR>/<pid>.json` (at most once per
+STORE_METRICS_FLUSH_INTERVAL seconds); the /metrics endpoint sums the
+snapshots of all processes, so a multi-worker deployment needs no external
+aggregator. With STORE_METRICS_DIR set to None only the serving process'
+own counters are reported.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_HELP = {
+    'store_requests_total': ('counter', 'HTTP requests by view, method and status.'),
+    'store_request_errors_total': ('counter', 'Requests that raised or returned a 5xx, by view.'),
+    'store_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'store_db_queries_total': ('counter', 'SQL statements issued, by view.'),
+    'store_db_query_duration_seconds_total': ('counter', 'Time spent in SQL, by view.'),
+    'store_cache_requests_total': ('counter', 'Cache lookups by view, cache and result (hit/miss).'),
+    'store_login_throttle_total': ('counter', 'Login/token attempts by throttle result (allowed/throttled/error).'),
+    'store_login_throttled_total': ('counter', 'Refused login/token attempts by the window that was full (ip/username).'),
+}
+
+_lock = threading.Lock()
+_samples = defaultdict(float)
+_last_flush = 0.0
+
+
+def view_name(request):
+    """The `view` label for `request`: its URL pattern name."""
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _samples[_key(name, labels)] += value
+    _maybe_flush()
+
+
+def observe(name, value, **labels):
+    """Record `value` in the histogram `name`."""
+    with _lock:
+        for bound in LATENCY_BUCKETS:
+            if value <= bound:
+                _samples[_key(f'{name}_bucket', dict(labels, le=str(bound)))] += 1
+        _samples[_key(f'{name}_bucket', dict(labels, le='+Inf'))] += 1
+        _samples[_key(f'{name}_sum', labels)] += value
+        _samples[_key(f'{name}_count', labels)] += 1
+    _maybe_flush()
+
+
+def _metrics_dir():
+    return getattr(settings, 'STORE_METRICS_DIR', None)
+
+
+def _maybe_flush(force=False):
+    global _last_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    interval = getattr(settings, 'STORE_METRICS_FLUSH_INTERVAL', 1.0)
+    if not force and now - _last_flush < interval:
+        return
+    _last_flush = now
+    with _lock:
+        snapshot = dict(_samples)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def collect():
+    """Samples of this process merged with the snapshots of all the others."""
+    with _lock:
+        merged = defaultdict(float, _samples)
+    directory = _metrics_dir()
+    if directory and os.path.isdir(directory):
+        own = f'{os.getpid()}.json'
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, value in snapshot.items():
+                merged[key] += value
+    return merged
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _family(name):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in METRICS_HELP:
+            return name[:-len(suffix)]
+    return name
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _sort_key(sample):
+    name, labels, _ = sample
+    le = dict(labels).get('le')
+    bound = float('inf') if le == '+Inf' else float(le or 0)
+    return (name, [pair for pair in labels if pair[0] != 'le'], bound)
+
+
+def render():
+    """Render all samples in the Prometheus text exposition format."""
+    families = defaultdict(list)
+    for key, value in collect().items():
+        name, labels = json.loads(key)
+        families[_family(name)].append((name, labels, value))
+
+    lines = []
+    for family in sorted(families):
+        kind, help_text = METRICS_HELP.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for name, labels, value in sorted(families[family], key=_sort_key):
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,170 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+
+def fingerprint(sql):
+    """Normalize a statement so repeats of the same query compare equal."""
+    sql = _IN_LIST.sub('(%s, ...)', sql)
+    return _SAVEPOINT.sub('"savepoint"', sql)
+
+
+# Recorders active in the current context. sync_to_async copies the
+# context into its worker thread, so queries an async view runs there are
+# recorded too, although they go through that thread's own connections.
+_active_recorders = ContextVar('store_query_recorders', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    """execute_wrapper installed once on every connection; feeds the active recorders."""
+    for recorder in reversed(_active_recorders.get()):
+        execute = partial(recorder, execute)
+    return execute(sql, params, many, context)
+
+
+def _install_dispatch(connection):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _install_dispatch(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+class QueryRecorder:
+    """Count, time and fingerprint every SQL statement run while active.
+
+    Covers every thread that inherits the current context, e.g. the
+    sync_to_async workers of an async view.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._token = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        # Connections opened before this module was imported missed the
+        # connection_created hook.
+        for connection in connections.all(initialized_only=True):
+            _install_dispatch(connection)
+        self._token = _active_recorders.set(_active_recorders.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorders.reset(self._token)
+
+    @property
+    def duplicates(self):
+        return {sql: n for sql, n in self.fingerprints.items() if n > 1}
+
+
+class AsyncCapableMiddleware:
+    """Base for middleware that runs natively under both WSGI and ASGI.
+
+    Sync-only middleware would push every async view back onto a worker
+    thread. Subclasses implement __call__ and __acall__.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class QueryInstrumentationMiddleware(AsyncCapableMiddleware):
+    """Record the SQL issued by each request.
+
+    The stats are kept on `request.query_stats`; with DEBUG on they are also
+    returned as X-DB-* response headers.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self.process(request, response, recorder)
+
+    async def __acall__(self, request):
+        with QueryRecorder() as recorder:
+            response = await self.get_response(request)
+        return self.process(request, response, recorder)
+
+    def process(self, request, response, recorder):
+        request.query_stats = recorder
+
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(recorder.count)
+            response['X-DB-Query-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+            response['X-DB-Duplicate-Queries'] = str(
+                sum(n - 1 for n in recorder.duplicates.values())
+            )
+        return response
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Feed request count, latency, errors and SQL time into store.metrics.
+
+    Must be listed before QueryInstrumentationMiddleware so that the query
+    stats are available once the response comes back.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        return self.process(request, response, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.process(request, response, time.perf_counter() - start)
+
+    def process(self, request, response, duration):
+        view = metrics.view_name(request)
+        metrics.inc(
+            'store_requests_total',
+            view=view,
+            method=request.method,
+            status=str(response.status_code)
+        )
+        metrics.observe('store_request_duration_seconds', duration, view=view)
+        if response.status_code >= 500:
+            metrics.inc('store_request_errors_total', view=view)
+
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            metrics.inc('store_db_queries_total', stats.count, view=view)
+            metrics.inc('store_db_query_duration_seconds_total', stats.duration, view=view)
+        return response
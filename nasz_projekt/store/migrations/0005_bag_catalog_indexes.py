@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_bag_photo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('sent', 'Sent'), ('done', 'Completed'), ('canceled', 'Canceled')], default='new', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['size', 'color'], name='store_bag_size_color_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['size', 'price'], name='store_bag_size_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['color', 'price'], name='store_bag_color_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['fabric', 'price'], name='store_bag_fabric_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['brand', 'price'], name='store_bag_brand_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bag',
+            index=models.Index(fields=['price'], name='store_bag_price_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+from store.search import CREATE_SEARCH_INDEX_SQL, DROP_SEARCH_INDEX_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_bag_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=CREATE_SEARCH_INDEX_SQL,
+            reverse_sql=DROP_SEARCH_INDEX_SQL,
+        ),
+    ]
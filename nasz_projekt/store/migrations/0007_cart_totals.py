@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    totals = CartItem.objects.filter(cart=OuterRef('pk')).values('cart')
+    Cart.objects.update(
+        total_price=Coalesce(Subquery(
+            totals.annotate(total=Sum(F('quantity') * F('price_at_time'))).values('total')
+        ), 0),
+        item_count=Coalesce(Subquery(
+            totals.annotate(count=Sum('quantity')).values('count')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_bag_search_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total_price',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from store.search import CREATE_SEARCH_INDEX_SQL
+
+
+def rename_duplicate_bags(apps, schema_editor):
+    # Bags can't simply be dropped (order lines protect them), so every
+    # duplicate after the first gets its id appended to the model name.
+    Bag = apps.get_model('store', 'Bag')
+    duplicates = (
+        Bag.objects.values('brand', 'model_name')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for group in duplicates:
+        bags = Bag.objects.filter(**{k: group[k] for k in ('brand', 'model_name')}).order_by('id')
+        for bag in bags[1:]:
+            suffix = f' ({bag.id})'
+            bag.model_name = bag.model_name[:100 - len(suffix)] + suffix
+            bag.save(update_fields=['model_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_cart_totals'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_bags, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bag',
+            constraint=models.UniqueConstraint(fields=('brand', 'model_name'), name='store_bag_brand_model_name_uniq'),
+        ),
+        # Adding the constraint makes SQLite rebuild store_bag, which drops the
+        # search triggers from 0006; recreate them and rebuild the index.
+        migrations.RunSQL(CREATE_SEARCH_INDEX_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_bag_brand_model_name_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('price_at_time', models.PositiveIntegerField()),
+                ('bag', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='store.bag')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.order')),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_orderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCategorySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('brand', models.CharField(max_length=50)),
+                ('size', models.IntegerField(choices=[(1, 'Mini'), (2, 'Midi'), (3, 'Maxi')])),
+                ('color', models.IntegerField(choices=[(1, 'Beige'), (2, 'White'), (3, 'Brown'), (4, 'Black'), (5, 'Red'), (6, 'Purple'), (7, 'Blue'), (8, 'Orange'), (9, 'Pink'), (10, 'Gold'), (11, 'Silver'), (12, 'Grey'), (13, 'Green'), (14, 'Yellow'), (15, 'Mixed')])),
+                ('fabric', models.IntegerField(choices=[(1, 'Natural Leather'), (2, 'Vegan Leather'), (3, 'Cotton'), (4, 'Nylon'), (5, 'Vinyl'), (6, 'Jute'), (7, 'Canvas')])),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'brand', 'size', 'color', 'fabric'), name='store_dailycategorysales_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day',), name='store_dailysales_day_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyBagSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('revenue', models.PositiveBigIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('bag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.bag')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'bag'), name='store_dailybagsales_day_bag_uniq')],
+            },
+        ),
+    ]
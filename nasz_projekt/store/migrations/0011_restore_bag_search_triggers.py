@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from store.search import CREATE_SEARCH_INDEX_SQL
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_sales_rollups'),
+    ]
+
+    operations = [
+        # Databases that applied 0008 before it recreated the search triggers
+        # lost them in the store_bag rebuild. Every statement is idempotent.
+        migrations.RunSQL(CREATE_SEARCH_INDEX_SQL, migrations.RunSQL.noop),
+    ]
@@ -1,12 +1,19 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django import forms 
 from django_countries.fields import CountryField
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models.signals import post_save
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.contrib.auth.signals import user_logged_out
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from .authentication import token_cache
+from .caching import bump_catalog_version
+from .images import generate_variants_safely
+
 
 SIZE = models.IntegerChoices(
     'SIZE',
@@ -34,6 +41,19 @@ class Bag(models.Model):
     amount = models.PositiveIntegerField() 
     photo = models.ImageField(upload_to='bag_photos/', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['size', 'color'], name='store_bag_size_color_idx'),
+            models.Index(fields=['size', 'price'], name='store_bag_size_price_idx'),
+            models.Index(fields=['color', 'price'], name='store_bag_color_price_idx'),
+            models.Index(fields=['fabric', 'price'], name='store_bag_fabric_price_idx'),
+            models.Index(fields=['brand', 'price'], name='store_bag_brand_price_idx'),
+            models.Index(fields=['price'], name='store_bag_price_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'model_name'], name='store_bag_brand_model_name_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.brand} {self.model_name}"
     
@@ -54,6 +74,10 @@ class User_acc(models.Model):
 class Cart(models.Model):
     user_cart = models.OneToOneField(User_acc, on_delete = models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Kept in step with the items by store.carts (and remove_bag_from_carts
+    # when a bag is deleted); see repair_cart_totals.
+    total_price = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Cart {self.user_cart}"
@@ -103,6 +127,117 @@ class Order(models.Model):
         return f"Order #{self.id}"
 
 
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    bag = models.ForeignKey(Bag, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    price_at_time = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.bag} x {self.quantity}"
+
+
+# Single row counting catalog changes; store.caching keys cached catalog
+# pages and ETags by it. It lives in the database rather than the cache so
+# that a bump in one worker process is seen by all of them.
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=1)
+
+
+# Daily sales rollups, kept up to date by store.reporting at checkout and
+# rebuilt from OrderItem by manage.py backfill_sales_rollups. `orders` is
+# the number of orders with at least one line in the row's group.
+class SalesRollup(models.Model):
+    day = models.DateField()
+    revenue = models.PositiveBigIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day'], name='store_dailysales_day_uniq'),
+        ]
+
+
+class DailyBagSales(SalesRollup):
+    bag = models.ForeignKey(Bag, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bag'], name='store_dailybagsales_day_bag_uniq'),
+        ]
+
+
+class DailyCategorySales(SalesRollup):
+    brand = models.CharField(max_length=50)
+    size = models.IntegerField(choices=SIZE.choices)
+    color = models.IntegerField(choices=COLOR.choices)
+    fabric = models.IntegerField(choices=FABRIC.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'brand', 'size', 'color', 'fabric'],
+                name='store_dailycategorysales_uniq'
+            ),
+        ]
+
+
+@receiver(post_save, sender=Bag)
+@receiver(post_delete, sender=Bag)
+def invalidate_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(pre_delete, sender=Bag)
+def remove_bag_from_carts(sender, instance, **kwargs):
+    # The cascade deletes the bag's cart items without going through
+    # store.carts, so take them out of the stored cart totals here.
+    item = CartItem.objects.filter(cart=OuterRef('pk'), bag=instance)
+    Cart.objects.filter(items__bag=instance).update(
+        total_price=Greatest(
+            F('total_price') - Subquery(item.values(total=F('quantity') * F('price_at_time'))[:1]), 0
+        ),
+        item_count=Greatest(F('item_count') - Subquery(item.values('quantity')[:1]), 0)
+    )
+
+
+@receiver(post_save, sender=Bag)
+def create_photo_variants(sender, instance, update_fields=None, **kwargs):
+    if not instance.photo:
+        return
+    if update_fields is not None and 'photo' not in update_fields:
+        return
+    # Resizing is slow; don't hold the write transaction open for it.
+    name = instance.photo.name
+    transaction.on_commit(lambda: generate_variants_safely(name))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    # Covers password changes and deactivation. Logins only touch last_login,
+    # which doesn't affect cached authentication.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_tokens_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        token_cache.invalidate_user(user.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate_key(instance.key)
+
+
 @receiver(post_save, sender=User)
 def create_user_account(sender, instance, created, **kwargs):
     if created:
@@ -125,6 +260,3 @@ def create_user_account(sender, instance, created, **kwargs):
             pass
         
         Token.objects.get_or_create(user=instance)
-
-post_save.connect(create_user_account, sender=User)
-
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Prefetch, Q, When
+
+from .caching import bump_catalog_version
+from .models import Bag, Order, OrderItem
+
+
+StockShortage = namedtuple('StockShortage', ['bag', 'requested', 'available'])
+
+
+class _StockChanged(Exception):
+    pass
+
+
+class OutOfStock(Exception):
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__('Not enough bags in stock for: ' + ', '.join(
+            f'{s.bag} (requested {s.requested}, available {s.available})'
+            for s in shortages
+        ))
+
+
+def _shortages(items):
+    bags = Bag.objects.in_bulk([item.bag_id for item in items])
+    shortages = []
+    for item in items:
+        bag = bags.get(item.bag_id)
+        if bag is None:
+            # Deleted since the cart was read: none left to sell.
+            shortages.append(StockShortage(item.bag, item.quantity, 0))
+        elif bag.amount < item.quantity:
+            shortages.append(StockShortage(bag, item.quantity, bag.amount))
+    return shortages
+
+
+def decrement_stock(items):
+    """Take `item.quantity` of `item.bag_id` off the shelf for every item.
+
+    All lines go out as one guarded UPDATE, so two checkouts racing for the
+    last bag can never both succeed, no stale row is written back and the
+    cost does not grow with the number of round trips. If any line cannot be
+    fulfilled nothing is decremented and OutOfStock lists every short line,
+    including bags deleted in the meantime (reported with none available;
+    `items` need `bag` loaded, select_related, to name them).
+    """
+    items = list(items)
+    if not items:
+        return
+
+    in_stock = Q()
+    for item in items:
+        in_stock |= Q(pk=item.bag_id, amount__gte=item.quantity)
+    new_amount = Case(
+        *[When(pk=item.bag_id, then=F('amount') - item.quantity) for item in items],
+        default=F('amount'),
+        output_field=PositiveIntegerField()
+    )
+
+    try:
+        with transaction.atomic():
+            updated = Bag.objects.filter(in_stock).update(amount=new_amount)
+            if updated != len(items):
+                raise _StockChanged
+    except _StockChanged:
+        raise OutOfStock(_shortages(items))
+
+    # update() skips post_save, so invalidate the cached catalog ourselves.
+    transaction.on_commit(bump_catalog_version)
+
+
+def create_order_items(order, items):
+    """Copy the cart lines onto `order` in one INSERT."""
+    return OrderItem.objects.bulk_create([
+        OrderItem(order=order, bag_id=item.bag_id, quantity=item.quantity, price_at_time=item.price_at_time)
+        for item in items
+    ])
+
+
+def order_history(user_acc):
+    """The account's orders with their lines and bags: one query per page plus one for the lines."""
+    return Order.objects.filter(user=user_acc).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('bag').order_by('id'))
+    )
@@ -0,0 +1,215 @@
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.request import Request
+
+from .caching import get_catalog_version
+from .catalog import parse_catalog_params, get_ordering, filter_bags
+
+
+class BagCursorPagination(CursorPagination):
+    """Keyset pagination for the catalog endpoints.
+
+    Pages are addressed by an opaque cursor instead of an offset, so reading
+    a deep page costs the same as reading the first one.
+
+    DRF's CursorPagination positions a cursor on the first ordering field
+    only and steps over ties with an offset, which skips bags that share a
+    price when paging backwards. Here the cursor holds every ordering field;
+    each catalog ordering ends in id, so positions are unique and pages are
+    cut with a (price, id) comparison that the composite indexes serve.
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        return get_ordering(parse_catalog_params(request.query_params))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._beyond(queryset.model, current_position, reverse))
+
+        # One extra row tells whether another page follows.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = (current_position is not None) or (offset > 0)
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _beyond(self, model, position, reverse):
+        """Rows after `position` in the (possibly reversed) ordering.
+
+        For an ordering (a, b) that is a >= x AND (a > x OR b > y): unlike
+        the plain OR of the two, the leading range lets SQLite seek the
+        (…, price) indexes instead of scanning them from the start.
+        """
+        values = position.split(',')
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition = None
+        for order, value in reversed(list(zip(self.ordering, values))):
+            name = order.lstrip('-')
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            after = Q(**{f'{name}__{lookup}': value})
+            if condition is not None:
+                after = Q(**{f'{name}__{lookup}e': value}) & (after | condition)
+            condition = after
+        return condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        return ','.join(str(getattr(instance, order.lstrip('-'))) for order in ordering)
+
+
+class OrderHistoryPagination(CursorPagination):
+    """Keyset pagination over a customer's orders, newest first."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-id',)
+
+
+class CatalogPage:
+    """One catalog page for a server-rendered template.
+
+    Nothing is queried until `bags` or `next_url` is read, so a page whose
+    grid fragment is already cached costs no SQL. `next_url` points at the
+    matching API endpoint (`api_url`), which the Load more button follows.
+    """
+
+    def __init__(self, request, api_url, size=None):
+        self.request = Request(request)
+        self.api_url = api_url
+        self.filters = parse_catalog_params(self.request.query_params, size=size)
+        self.paginator = BagCursorPagination()
+
+    @property
+    def version(self):
+        return get_catalog_version()
+
+    @cached_property
+    def cache_key(self):
+        raw = json.dumps([
+            self.filters,
+            self.request.query_params.get(self.paginator.cursor_query_param),
+            self.paginator.get_page_size(self.request),
+        ], sort_keys=True)
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    @cached_property
+    def bags(self):
+        bags = self.paginator.paginate_queryset(filter_bags(self.filters), self.request)
+        query = self.request.query_params.copy()
+        query.pop(self.paginator.cursor_query_param, None)
+        self.paginator.base_url = f'{self.api_url}?{query.urlencode()}' if query else self.api_url
+        return bags
+
+    @cached_property
+    def next_url(self):
+        self.bags
+        return self.paginator.get_next_link()
+
+
+def estimated_row_count(model, using='default'):
+    """A cheap estimate of the number of rows in `model`'s table.
+
+    PostgreSQL and MySQL keep one in their catalogs, and SQLite in
+    sqlite_stat1 once ANALYZE (or PRAGMA optimize) has run. Without
+    statistics the span of primary keys is used: an upper bound read from
+    the index, which overstates tables that have had many rows deleted.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] is not None:
+                return row[0]
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # Each stat starts with the row count of its index; partial
+                # indexes hold fewer rows, hence MAX.
+                cursor.execute('SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s', [table])
+                row = cursor.fetchone()
+                if row and row[0] is not None:
+                    return row[0]
+    bounds = model._default_manager.using(using).aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['last'] is None:
+        return 0
+    return bounds['last'] - bounds['first'] + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for admin changelists over large tables.
+
+    An unfiltered list of more than `threshold` rows reports an estimated
+    count instead of running COUNT(*) over the whole table; filtered lists
+    and small tables are counted exactly.
+    """
+    threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate > self.threshold:
+                return estimate
+        return super().count
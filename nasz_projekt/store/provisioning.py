@@ -0,0 +1,188 @@
+"""Bulk provisioning of users with their account and API token.
+
+Rows are validated with the field helpers from store.serializers, the
+passwords of a whole batch are hashed through `hash_map` (the command
+passes a process pool's map, so hashing uses every CPU), and User,
+User_acc and Token rows are bulk-inserted per batch. bulk_create sends no
+post_save, so create_user_account doesn't run a get_or_create per user.
+"""
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django_countries import countries
+from phonenumber_field.validators import validate_international_phonenumber
+from rest_framework.authtoken.models import Token
+
+from .accounts import default_account_fields
+from .models import User_acc
+from .serializers import (
+    validate_name_starts_with_capital,
+    validate_email_format,
+    validate_phone_number,
+    validate_zip_code,
+    validate_not_empty,
+)
+
+
+BATCH_SIZE = 1000
+ACCOUNT_FIELDS = [
+    'name', 'surname', 'street_name', 'home_nr', 'city', 'zip_code', 'country', 'phone_number',
+]
+FIELD_VALIDATORS = {
+    'username': [validate_not_empty, UnicodeUsernameValidator()],
+    'email': [validate_email_format],
+    'name': [validate_name_starts_with_capital],
+    'surname': [validate_name_starts_with_capital],
+    'street_name': [validate_not_empty],
+    'home_nr': [validate_not_empty],
+    'city': [validate_not_empty],
+    'zip_code': [validate_zip_code],
+    'country': [validate_not_empty],
+    'phone_number': [validate_phone_number, validate_international_phonenumber],
+}
+REQUIRED_FIELDS = ('username', 'email')
+COUNTRY_CODES = {code for code, _ in countries}
+
+
+def hash_password(password):
+    """make_password(), or an unusable password for an empty one."""
+    return make_password(password or None)
+
+
+def _max_lengths():
+    lengths = {'username': User._meta.get_field('username').max_length}
+    for name in ACCOUNT_FIELDS + ['email']:
+        field = User_acc._meta.get_field(name)
+        if field.max_length:
+            lengths[name] = field.max_length
+    return lengths
+
+
+def validate_row(row, max_lengths):
+    """Return (cleaned row, errors); blank optional fields are dropped.
+
+    Values are stripped, except the password, which is kept exactly as given
+    (as Django's password forms do).
+    """
+    row = {
+        k: v.strip() if isinstance(v, str) and k != 'password' else v
+        for k, v in row.items()
+        if k in FIELD_VALIDATORS or k == 'password'
+    }
+    errors = {}
+    for name in REQUIRED_FIELDS:
+        if not row.get(name):
+            errors[name] = ['This field is required.']
+    for name, validators in FIELD_VALIDATORS.items():
+        value = row.get(name)
+        if name in errors:
+            continue
+        if value in ('', None):
+            row.pop(name, None)
+            continue
+        if not isinstance(value, str):
+            value = row[name] = str(value)
+        if name in max_lengths and len(value) > max_lengths[name]:
+            errors[name] = [f'Ensure this field has no more than {max_lengths[name]} characters.']
+            continue
+        try:
+            for validator in validators:
+                validator(value)
+        except DjangoValidationError as e:
+            errors[name] = e.messages
+
+    if 'email' in row and 'email' not in errors:
+        row['email'] = row['email'].lower()
+    if 'country' in row and 'country' not in errors:
+        row['country'] = row['country'].upper()
+        if row['country'] not in COUNTRY_CODES:
+            errors['country'] = ['Use a two-letter ISO 3166 country code.']
+    return row, errors
+
+
+class UserProvisioner:
+    """Validate and create users batch by batch; collect per-row errors.
+
+    Existing usernames and account emails are reported as errors, never
+    updated. Call run() with (row number, dict) pairs, e.g. from
+    store.imports.read_rows().
+    """
+
+    def __init__(self, dry_run=False, batch_size=BATCH_SIZE, hash_map=map):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.hash_map = hash_map
+        self.created = 0
+        self.errors = []
+        self.max_lengths = _max_lengths()
+
+    def run(self, rows):
+        batch = []
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= self.batch_size:
+                self._provision_batch(batch)
+                batch = []
+        if batch:
+            self._provision_batch(batch)
+        return self
+
+    def _error(self, number, errors):
+        self.errors.append({'row': number, 'errors': errors})
+
+    def _provision_batch(self, batch):
+        valid = []
+        seen_usernames, seen_emails = set(), set()
+        for number, row in batch:
+            if '__error__' in row:
+                self._error(number, {'non_field_errors': [row['__error__']]})
+                continue
+            row, errors = validate_row(row, self.max_lengths)
+            if not errors:
+                if row['username'] in seen_usernames:
+                    errors['username'] = ['Duplicate username in this file.']
+                elif row['email'] in seen_emails:
+                    errors['email'] = ['Duplicate email in this file.']
+            if errors:
+                self._error(number, errors)
+                continue
+            seen_usernames.add(row['username'])
+            seen_emails.add(row['email'])
+            valid.append((number, row))
+
+        taken_usernames = set(
+            User.objects.filter(username__in=seen_usernames).values_list('username', flat=True)
+        )
+        taken_emails = set(
+            User_acc.objects.filter(email__in=seen_emails).values_list('email', flat=True)
+        )
+        rows = []
+        for number, row in valid:
+            if row['username'] in taken_usernames:
+                self._error(number, {'username': ['A user with that username already exists.']})
+            elif row['email'] in taken_emails:
+                self._error(number, {'email': ['An account with that email already exists.']})
+            else:
+                rows.append(row)
+
+        if not rows or self.dry_run:
+            self.created += len(rows)
+            return
+
+        hashes = list(self.hash_map(hash_password, [row.get('password') for row in rows]))
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=row['username'], email=row['email'], password=hashed,
+                     first_name=row.get('name', ''), last_name=row.get('surname', ''))
+                for row, hashed in zip(rows, hashes)
+            ])
+            accounts = []
+            for user, row in zip(users, rows):
+                fields = default_account_fields(user)
+                fields.update((name, row[name]) for name in ACCOUNT_FIELDS if name in row)
+                accounts.append(User_acc(django_user=user, **fields))
+            User_acc.objects.bulk_create(accounts)
+            Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+        self.created += len(rows)
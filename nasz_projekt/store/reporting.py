@@ -0,0 +1,220 @@
+"""Daily sales rollups and the reports read from them.
+
+record_order() adds a new order to DailySales, DailyBagSales and
+DailyCategorySales inside the checkout transaction, with one
+INSERT ... ON CONFLICT DO UPDATE per table that adds to the counters
+already there. rebuild_days() recomputes whole days from OrderItem with
+GROUP BY queries (see manage.py backfill_sales_rollups); canceled orders
+are not counted, so the admin rebuilds the days of orders it moves into or
+out of CANCELED (see order_days()). sales_report()
+only ever reads the rollups, so its cost depends on the number of days and
+groups asked for, not on the number of orders.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Order, OrderItem, DailySales, DailyBagSales, DailyCategorySales, SIZE, COLOR, FABRIC
+
+
+ROLLUP_FIELDS = ('revenue', 'units', 'orders')
+CATEGORY_FIELDS = ('brand', 'size', 'color', 'fabric')
+GROUP_BY_CHOICES = ('day', 'bag') + CATEGORY_FIELDS
+CHOICE_FIELDS = {'size': SIZE, 'color': COLOR, 'fabric': FABRIC}
+DEFAULT_DAYS = 30
+MAX_LIMIT = 1000
+
+
+class ReportError(ValueError):
+    pass
+
+
+def _upsert_add(model, key_fields, rows):
+    """Insert `rows` (key values + revenue, units, orders), adding to existing rows with the same key."""
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    keys = [qn(model._meta.get_field(name).column) for name in key_fields]
+    columns = keys + [qn(name) for name in ROLLUP_FIELDS]
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET '
+        + ', '.join(f'{qn(name)} = {table}.{qn(name)} + excluded.{qn(name)}' for name in ROLLUP_FIELDS)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def record_order(order, items):
+    """Add a just-placed order to the rollups; call inside the checkout transaction.
+
+    `items` need `bag` loaded (select_related), plus quantity and price_at_time.
+    """
+    items = list(items)
+    if not items:
+        return
+    day = connection.ops.adapt_datefield_value(timezone.localdate(order.created_at))
+    by_bag = defaultdict(lambda: [0, 0])
+    by_category = defaultdict(lambda: [0, 0])
+    for item in items:
+        bag = item.bag
+        for totals, key in ((by_bag, (bag.id,)), (by_category, (bag.brand, bag.size, bag.color, bag.fabric))):
+            totals[key][0] += item.quantity * item.price_at_time
+            totals[key][1] += item.quantity
+
+    _upsert_add(DailySales, ['day'], [(
+        day, sum(revenue for revenue, _ in by_bag.values()), sum(units for _, units in by_bag.values()), 1
+    )])
+    _upsert_add(DailyBagSales, ['day', 'bag'], [
+        (day, *key, revenue, units, 1) for key, (revenue, units) in by_bag.items()
+    ])
+    _upsert_add(DailyCategorySales, ['day', *CATEGORY_FIELDS], [
+        (day, *key, revenue, units, 1) for key, (revenue, units) in by_category.items()
+    ])
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def _in_days(start, end, prefix=''):
+    return {
+        f'{prefix}created_at__gte': _day_start(start),
+        f'{prefix}created_at__lt': _day_start(end + timedelta(days=1)),
+    }
+
+
+def orders_without_lines(start, end):
+    """Orders of start..end placed before OrderItem existed, which rebuild_days() can't see."""
+    return Order.objects.filter(items__isnull=True, **_in_days(start, end))
+
+
+def order_days(orders):
+    """The days `orders` were placed on, in order, as rebuild_days() counts them."""
+    day = TruncDate('created_at', tzinfo=timezone.get_current_timezone())
+    return sorted(set(orders.order_by().annotate(day=day).values_list('day', flat=True)))
+
+
+def rebuild_days(start, end):
+    """Recompute the rollups of start..end (inclusive) from OrderItem in one transaction.
+
+    Returns the number of DailySales rows written. Rebuilding is idempotent,
+    so an interrupted backfill can simply be run again. Canceled orders and
+    orders without lines (see orders_without_lines()) are left out.
+    """
+    lines = OrderItem.objects.filter(**_in_days(start, end, 'order__')).exclude(
+        order__status=Order.Status.CANCELED
+    ).order_by()
+    day = TruncDate('order__created_at', tzinfo=timezone.get_current_timezone())
+    totals = {
+        'revenue': Sum(F('quantity') * F('price_at_time')),
+        'units': Sum('quantity'),
+        'orders': Count('order', distinct=True),
+    }
+
+    with transaction.atomic():
+        for model in (DailySales, DailyBagSales, DailyCategorySales):
+            model.objects.filter(day__range=(start, end)).delete()
+        days = DailySales.objects.bulk_create(
+            [DailySales(**row) for row in lines.values(day=day).annotate(**totals)],
+            batch_size=1000
+        )
+        DailyBagSales.objects.bulk_create(
+            [DailyBagSales(bag_id=row.pop('bag'), **row) for row in lines.values('bag', day=day).annotate(**totals)],
+            batch_size=1000
+        )
+        categories = {name: F(f'bag__{name}') for name in CATEGORY_FIELDS}
+        DailyCategorySales.objects.bulk_create(
+            [DailyCategorySales(**row) for row in lines.values(day=day, **categories).annotate(**totals)],
+            batch_size=1000
+        )
+    return len(days)
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ReportError(f'{name} must be a date in YYYY-MM-DD format.')
+
+
+def parse_report_params(params):
+    """Validate `start`, `end` (inclusive dates, default: the last 30 days),
+    `group_by` (comma-separated; 'bag' can't be combined with brand, size,
+    color or fabric; empty for totals only) and `limit`.
+    """
+    end = _parse_date(params.get('end'), 'end') or timezone.localdate()
+    start = _parse_date(params.get('start'), 'start') or end - timedelta(days=DEFAULT_DAYS - 1)
+    if start > end:
+        raise ReportError('start must not be after end.')
+
+    group_by = [g for g in params.get('group_by', 'day').split(',') if g]
+    invalid = set(group_by) - set(GROUP_BY_CHOICES)
+    if invalid:
+        raise ReportError(f'Unknown group_by: {", ".join(sorted(invalid))}.')
+    if 'bag' in group_by and set(group_by) & set(CATEGORY_FIELDS):
+        raise ReportError('bag cannot be combined with brand, size, color or fabric.')
+
+    try:
+        limit = int(params.get('limit') or MAX_LIMIT)
+    except ValueError:
+        raise ReportError('limit must be a number.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ReportError(f'limit must be between 1 and {MAX_LIMIT}.')
+
+    return {'start': start, 'end': end, 'group_by': list(dict.fromkeys(group_by)), 'limit': limit}
+
+
+def _sums():
+    return {name: Coalesce(Sum(name), 0) for name in ROLLUP_FIELDS}
+
+
+def _format_row(row):
+    if 'day' in row:
+        row['day'] = row['day'].isoformat()
+    for name, choices in CHOICE_FIELDS.items():
+        if name in row:
+            row[name] = choices(row[name]).name
+    if 'bag' in row:
+        row['brand'] = row.pop('bag__brand')
+        row['model_name'] = row.pop('bag__model_name')
+    return row
+
+
+def sales_report(options):
+    """Revenue, units and orders for parse_report_params() options, read from the rollups."""
+    start, end, group_by = options['start'], options['end'], options['group_by']
+    report = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'group_by': group_by,
+        'totals': DailySales.objects.filter(day__range=(start, end)).aggregate(**_sums()),
+        'results': [],
+    }
+    if not group_by:
+        return report
+
+    if 'bag' in group_by:
+        model = DailyBagSales
+        fields = [name for name in group_by if name != 'bag'] + ['bag', 'bag__brand', 'bag__model_name']
+    elif set(group_by) & set(CATEGORY_FIELDS):
+        model = DailyCategorySales
+        fields = group_by
+    else:
+        model = DailySales
+        fields = group_by
+    ordering = (['day'] if 'day' in group_by else []) + ['-revenue']
+
+    rows = (
+        model.objects.filter(day__range=(start, end))
+        .values(*fields).annotate(**_sums()).order_by(*ordering)[:options['limit']]
+    )
+    report['results'] = [_format_row(row) for row in rows]
+    return report
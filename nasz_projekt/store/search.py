@@ -0,0 +1,88 @@
+import re
+
+from django.db import connection
+
+from .models import Bag
+
+
+MAX_SEARCH_RESULTS = 50
+
+# External-content FTS5 index over Bag.brand and Bag.model_name. The
+# triggers keep it in sync for every write path, including bulk_create()
+# and queryset.update(), which bypass model signals. The migrations that
+# create or restore the index run this list, so every statement must stay
+# idempotent.
+CREATE_SEARCH_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS store_bag_fts USING fts5(
+        brand,
+        model_name,
+        content='store_bag',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_bag_fts_ai AFTER INSERT ON store_bag BEGIN
+        INSERT INTO store_bag_fts(rowid, brand, model_name)
+        VALUES (new.id, new.brand, new.model_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_bag_fts_ad AFTER DELETE ON store_bag BEGIN
+        INSERT INTO store_bag_fts(store_bag_fts, rowid, brand, model_name)
+        VALUES ('delete', old.id, old.brand, old.model_name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS store_bag_fts_au AFTER UPDATE OF brand, model_name ON store_bag BEGIN
+        INSERT INTO store_bag_fts(store_bag_fts, rowid, brand, model_name)
+        VALUES ('delete', old.id, old.brand, old.model_name);
+        INSERT INTO store_bag_fts(rowid, brand, model_name)
+        VALUES (new.id, new.brand, new.model_name);
+    END
+    """,
+    "INSERT INTO store_bag_fts(store_bag_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX_SQL = [
+    "DROP TRIGGER IF EXISTS store_bag_fts_au",
+    "DROP TRIGGER IF EXISTS store_bag_fts_ad",
+    "DROP TRIGGER IF EXISTS store_bag_fts_ai",
+    "DROP TABLE IF EXISTS store_bag_fts",
+]
+
+
+def rebuild_search_index():
+    """Recreate the triggers and reindex every bag.
+
+    SQLite drops triggers together with their table, so this has to be run
+    after any migration that makes Django rebuild store_bag.
+    """
+    with connection.cursor() as cursor:
+        for statement in CREATE_SEARCH_INDEX_SQL:
+            cursor.execute(statement)
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    terms = re.findall(r'\w+', query or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_bags(query, limit=20):
+    """Return bags matching `query`, best match first."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid FROM store_bag_fts WHERE store_bag_fts MATCH %s "
+            "ORDER BY rank LIMIT %s",
+            [match, limit]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    bags = Bag.objects.in_bulk(ids)
+    return [bags[bag_id] for bag_id in ids if bag_id in bags]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError as DjangoValidationError
-from .models import Bag, User_acc, Cart, CartItem, OrderSummary, OrderSummaryItem, Order, SIZE, COLOR, FABRIC
+from .models import Bag, User_acc, Cart, CartItem, OrderSummary, OrderSummaryItem, Order, OrderItem, SIZE, COLOR, FABRIC
+from .images import variant_urls
 import re
 
 ZIP_PL_REGEX = r"^\d{2}-\d{3}$"
@@ -54,10 +55,17 @@ def validate_not_empty(value):
     return value
 
 class BagSerializer(serializers.ModelSerializer):
+    photo_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Bag
         fields = "__all__"
 
+    def get_photo_variants(self, obj):
+        if not obj.photo:
+            return None
+        return variant_urls(obj.photo.name)
+
     def validate_model_name(self, value):
         value = str(value).strip()
         if not value:
@@ -158,19 +166,34 @@ class CartItemSerializer(serializers.ModelSerializer):
         return data
     
 
+class CartOperationSerializer(serializers.Serializer):
+    OPERATIONS = ["add", "set", "remove"]
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    bag = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, data):
+        if data["op"] == "remove":
+            data["quantity"] = 0
+        elif data.get("quantity") is None:
+            raise serializers.ValidationError({"quantity": "This field is required."})
+        elif data["op"] == "add" and data["quantity"] <= 0:
+            raise serializers.ValidationError({"quantity": "Quantity must be greater than zero."})
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
 
     class Meta:
         model = Cart
-        fields = ["id", "user_cart", "created_at", "items", "total_price"]
-
-    def get_total_price(self, obj):
-        return sum(
-            item.quantity * item.price_at_time
-            for item in obj.items.all()
-        )
+        fields = ["id", "user_cart", "created_at", "items", "total_price", "item_count"]
+        read_only_fields = ["total_price", "item_count"]
 
 
 class OrderSummarySerializer(serializers.ModelSerializer):
@@ -183,7 +206,17 @@ class OrderSummaryItemSerializer(serializers.ModelSerializer):
         model = OrderSummaryItem
         fields = "__all__"
 
+class OrderItemSerializer(serializers.ModelSerializer):
+    brand = serializers.CharField(source="bag.brand", read_only=True)
+    model_name = serializers.CharField(source="bag.model_name", read_only=True)
+
+    class Meta:
+        model = OrderItem
+        fields = ["bag", "brand", "model_name", "quantity", "price_at_time"]
+
 class OrderSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
+
     class Meta:
         model = Order
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
@@ -0,0 +1,24 @@
+from django import template
+
+from store.images import VARIANT_WIDTHS, variant_urls
+
+
+register = template.Library()
+
+
+def _srcset(urls):
+    return ', '.join(f'{urls[str(width)]} {width}w' for width in VARIANT_WIDTHS)
+
+
+@register.inclusion_tag('bag/_photo.html')
+def bag_photo(bag, sizes='120px'):
+    if not bag.photo:
+        return {'photo': None}
+    variants = variant_urls(bag.photo.name)
+    return {
+        'photo': bag.photo,
+        'src': variants['jpeg'][str(VARIANT_WIDTHS[0])],
+        'jpeg_srcset': _srcset(variants['jpeg']),
+        'webp_srcset': _srcset(variants['webp']),
+        'sizes': sizes,
+    }
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import base64
+import json
+import math
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import addModuleCleanup, mock
 
-# Create your tests here.
+from django.contrib.auth.models import User, update_last_login
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Max, Min
+from django.test import TestCase, Client, AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import metrics
+from .authentication import token_cache
+from .caching import CATALOG_VERSION_KEY
+from .carts import carts_with_drift
+from .catalog import SORT_ORDERINGS
+from .images import variant_name
+from .middleware import QueryRecorder
+from .orders import OutOfStock, decrement_stock
+from .throttling import login_limiter
+from .admin import update_in_chunks
+from .pagination import estimated_row_count
+from .models import (
+    SIZE, COLOR, FABRIC, Bag, Cart, CartItem, CatalogVersion, Order, OrderItem, OrderSummary, OrderSummaryItem, User_acc,
+    DailySales, DailyBagSales, DailyCategorySales,
+)
+from .provisioning import UserProvisioner
+from .reporting import rebuild_days
+from .search import search_bags
+from .urls import urlpatterns
+
+
+CHECKOUT_DATA = {
+    'name': 'Anna',
+    'surname': 'Nowak',
+    'email': 'anna@example.com',
+    'street_name': 'Polna',
+    'home_nr': '1',
+    'city': 'Warszawa',
+    'zip_code': '00-001',
+    'country': 'PL',
+    'phone_number': '+48123456789',
+}
+
+def setUpModule():
+    # Every request feeds store.metrics, which snapshots into
+    # STORE_METRICS_DIR and /metrics reads back; keep both away from the
+    # project's own directory.
+    metrics_dir = tempfile.TemporaryDirectory()
+    addModuleCleanup(metrics_dir.cleanup)
+    metrics_settings = override_settings(STORE_METRICS_DIR=metrics_dir.name)
+    metrics_settings.enable()
+    addModuleCleanup(metrics_settings.disable)
+
+
+# Maximum number of SQL statements per URL, measured with a three-line
+# cart and a cold catalog cache (so catalog views include reading the
+# catalog version). A view whose cost grows with the size of
+# the cart or catalog (an N+1) blows its budget.
+QUERY_BUDGETS = {
+    'store:api-bags-list': 2,
+    'store:api-bags-small': 2,
+    'store:api-bags-medium': 2,
+    'store:api-bags-big': 2,
+    'store:api-bags-search': 3,
+    'store:api-bags-import': 6,
+    'store:api-register': 10,
+    'store:api-login': 9,
+    'store:api-token': 2,
+    'store:api-token-rotate': 7,
+    'store:api-logout': 4,
+    'store:api-users-provision': 9,
+    'store:api-cart': 8,
+    'store:api-cart-batch': 16,
+    'store:api-cart-totals': 7,
+    'store:api-summary': 7,
+    'store:api-orders': 8,
+    'store:api-export-orders': 5,
+    'store:api-reports-sales': 4,
+    'store:api-async-bags-list': 2,
+    'store:api-async-bags-small': 2,
+    'store:api-async-bags-medium': 2,
+    'store:api-async-bags-big': 2,
+    'store:api-async-cart': 9,
+    'store:api-async-summary': 7,
+    'store:main-page': 2,
+    'store:login-page': 9,
+    'store:register-page': 0,
+    'store:logout': 4,
+    'store:account-profile': 6,
+    'store:edit-account': 10,
+    'store:account-orders': 8,
+    'store:bags-list-html': 0,
+    'store:bag-detail-html': 12,
+    'store:small-bags': 2,
+    'store:medium-bags': 2,
+    'store:big-bags': 2,
+    'store:search': 2,
+    'store:cart': 7,
+    'store:remove-from-cart': 11,
+    'store:checkout': 20,
+    'store:order-summary': 11,
+    'store:metrics': 2,
+}
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    STORE_LOGIN_THROTTLE_DB=':memory:'
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.bags = Bag.objects.bulk_create([
+            Bag(brand='Gucci', model_name=f'Marmont {i}', size=i % 3 + 1, price=1000 + i, amount=10)
+            for i in range(6)
+        ])
+        cls.user = User.objects.create_user('anna', password='secret-pass-1')
+        cls.staff = User.objects.create_user('ewa', password='secret-pass-3', is_staff=True)
+        cart = Cart.objects.create(
+            user_cart=cls.user.user_acc,
+            total_price=sum(bag.price for bag in cls.bags[:3]),
+            item_count=3
+        )
+        cls.items = CartItem.objects.bulk_create([
+            CartItem(cart=cart, bag=bag, quantity=1, price_at_time=bag.price)
+            for bag in cls.bags[:3]
+        ])
+        summary = OrderSummary.objects.create(user=cls.user.user_acc, total_price=1000)
+        OrderSummaryItem.objects.create(summary=summary, bag=cls.bags[0], quantity=1, price_at_time=1000)
+        orders = Order.objects.bulk_create([Order(user=cls.user.user_acc, total_price=3000) for _ in range(3)])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, bag=bag, quantity=1, price_at_time=bag.price)
+            for order in orders for bag in cls.bags[:3]
+        ])
+
+    def setUp(self):
+        cache.clear()
+        login_limiter.reset()
+
+    def client_for(self, logged_in):
+        client = Client()
+        if logged_in == 'staff':
+            client.force_login(self.staff)
+        elif logged_in:
+            client.force_login(self.user)
+        return client
+
+    def request_for(self, name):
+        """(method, url, data, logged_in) exercising the URL's main path."""
+        bag = self.bags[0]
+        cases = {
+            'store:api-bags-search': ('get', reverse('store:api-bags-search') + '?q=gucci', None, False),
+            'store:api-bags-import': ('upload', reverse('store:api-bags-import'), {'file': SimpleUploadedFile(
+                'bags.csv', b'brand,model_name,size,color,fabric,price,amount\n'
+                b'Gucci,Marmont 0,mini,black,canvas,1200,4\nGucci,Jackie,maxi,red,natural_leather,3000,2\n'
+            )}, 'staff'),
+            'store:api-register': ('post', reverse('store:api-register'), {'username': 'ola', 'password': 'secret-pass-2'}, False),
+            'store:api-login': ('post', reverse('store:api-login'), {'username': 'anna', 'password': 'secret-pass-1'}, False),
+            'store:api-token': ('post', reverse('store:api-token'), {'username': 'anna', 'password': 'secret-pass-1'}, False),
+            'store:api-users-provision': ('upload', reverse('store:api-users-provision'), {'file': SimpleUploadedFile(
+                'users.csv', b'username,email,password,name,city\n'
+                b'firma1,firma1@example.com,secret-pass-3,Firma,Krakow\nfirma2,firma2@example.com,,,\n'
+            )}, 'staff'),
+            'store:api-token-rotate': ('post', reverse('store:api-token-rotate'), None, True),
+            'store:api-logout': ('post', reverse('store:api-logout'), None, True),
+            'store:api-cart': ('get', reverse('store:api-cart'), None, True),
+            'store:api-cart-batch': ('post', reverse('store:api-cart-batch'), {'operations': [
+                {'op': 'add', 'bag': self.bags[3].id, 'quantity': 1},
+                {'op': 'set', 'bag': self.bags[0].id, 'quantity': 2},
+                {'op': 'remove', 'bag': self.bags[1].id},
+            ]}, True),
+            'store:api-cart-totals': ('get', reverse('store:api-cart-totals'), None, True),
+            'store:api-summary': ('get', reverse('store:api-summary'), None, True),
+            'store:api-orders': ('get', reverse('store:api-orders'), None, True),
+            'store:account-orders': ('get', reverse('store:account-orders'), None, True),
+            'store:api-async-cart': ('get', reverse('store:api-async-cart'), None, True),
+            'store:api-async-summary': ('get', reverse('store:api-async-summary'), None, True),
+            'store:api-reports-sales': ('get', reverse('store:api-reports-sales') + '?group_by=day,brand', None, 'staff'),
+            'store:api-export-orders': ('get', reverse('store:api-export-orders') + '?kind=summaries', None, 'staff'),
+            'store:login-page': ('post', reverse('store:login-page'), {'username': 'anna', 'password': 'secret-pass-1'}, False),
+            'store:logout': ('get', reverse('store:logout'), None, True),
+            'store:account-profile': ('get', reverse('store:account-profile'), None, True),
+            'store:edit-account': ('post', reverse('store:edit-account'), CHECKOUT_DATA, True),
+            'store:bag-detail-html': ('post', reverse('store:bag-detail-html', args=[bag.id]), {'quantity': 1}, True),
+            'store:search': ('get', reverse('store:search') + '?q=gucci', None, False),
+            'store:cart': ('get', reverse('store:cart'), None, True),
+            'store:remove-from-cart': ('get', reverse('store:remove-from-cart', args=[self.items[0].id]), None, True),
+            'store:checkout': ('post', reverse('store:checkout'), CHECKOUT_DATA, True),
+            'store:order-summary': ('get', reverse('store:order-summary'), None, True),
+            'store:metrics': ('get', reverse('store:metrics'), None, 'staff'),
+        }
+        if name in cases:
+            return cases[name]
+        return ('get', reverse(name), None, False)
+
+    def test_every_url_has_a_budget(self):
+        names = {f'store:{pattern.name}' for pattern in urlpatterns}
+        self.assertEqual(names - QUERY_BUDGETS.keys(), set())
+
+    def test_query_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(url=name):
+                method, url, data, logged_in = self.request_for(name)
+                client = self.client_for(logged_in)
+                cache.clear()
+                with transaction.atomic():
+                    with QueryRecorder() as recorder:
+                        if method == 'post' and name.startswith('store:api-'):
+                            response = client.post(url, data, content_type='application/json')
+                        elif method in ('post', 'upload'):
+                            response = client.post(url, data)
+                        else:
+                            response = client.get(url)
+                        if response.streaming:
+                            b''.join(response.streaming_content)
+                    transaction.set_rollback(True)
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    recorder.count, budget,
+                    f'{name} ran {recorder.count} queries; duplicates: {recorder.duplicates}'
+                )
+
+    def test_debug_headers(self):
+        with override_settings(DEBUG=True):
+            response = self.client.get(reverse('store:small-bags'))
+        self.assertEqual(response['X-DB-Query-Count'], '2')
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+
+    @override_settings(DEBUG=True)
+    async def test_async_views_count_their_queries(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        for name in ('store:api-async-bags-list', 'store:api-async-cart'):
+            with self.subTest(url=name):
+                response = await client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(int(response['X-DB-Query-Count']), 0)
+
+
+class MetricsAccessTests(TestCase):
+    @override_settings(STORE_METRICS_TOKEN='scrape-secret')
+    def test_metrics_need_staff_or_the_scrape_token(self):
+        url = reverse('store:metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer scrape-secret'}).status_code, 200)
+
+        self.client.force_login(User.objects.create_user('ola', password='secret-pass-2'))
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(User.objects.create_user('ewa', password='secret-pass-3', is_staff=True))
+        self.assertContains(self.client.get(url), '# TYPE store_requests_total counter')
+
+    def test_catalog_cache_lookups_are_counted_per_view(self):
+        def lookups(view):
+            counts = {}
+            for result in ('miss', 'hit'):
+                prefix = f'store_cache_requests_total{{cache="catalog",result="{result}",view="{view}"}} '
+                counts[result] = next(
+                    (int(line[len(prefix):]) for line in metrics.render().splitlines() if line.startswith(prefix)), 0
+                )
+            return counts
+
+        cache.clear()
+        for name, params in (
+            ('store:api-bags-list', {}), ('store:api-async-bags-small', {}), ('store:api-bags-search', {'q': 'gucci'}),
+        ):
+            with self.subTest(url=name):
+                before = lookups(name)
+                self.client.get(reverse(name), params)
+                self.client.get(reverse(name), params)
+                self.assertEqual(lookups(name), {'miss': before['miss'] + 1, 'hit': before['hit'] + 1})
+
+
+class UserAccountTests(TestCase):
+    def test_account_changes_show_up_in_other_sessions(self):
+        user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('store:account-profile')), 'Not provided')
+
+        User_acc.objects.filter(django_user=user).update(city='Gdansk')
+        self.assertContains(self.client.get(reverse('store:account-profile')), 'Gdansk')
+
+    def test_session_user_and_account_load_in_one_query(self):
+        user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(user)
+        self.client.get(reverse('store:account-profile'))
+        with QueryRecorder() as recorder:
+            self.assertEqual(self.client.get(reverse('store:account-profile')).status_code, 200)
+        user_queries = [sql for sql in recorder.fingerprints if 'FROM "auth_user"' in sql]
+        self.assertEqual(len(user_queries), 1)
+        self.assertIn('JOIN "store_user_acc"', user_queries[0])
+        self.assertFalse(any('FROM "store_user_acc"' in sql for sql in recorder.fingerprints))
+        self.assertEqual(recorder.count, 2, recorder.fingerprints)
+
+
+class SearchIndexTests(TestCase):
+    def test_bags_written_after_migrations_are_indexed(self):
+        bag = Bag.objects.create(brand='Prada', model_name='Galleria', size=2, price=9000, amount=1)
+        self.assertEqual(search_bags('pr gal'), [bag])
+        bag.model_name = 'Cleo'
+        bag.save()
+        self.assertEqual(search_bags('cleo'), [bag])
+        self.assertEqual(search_bags('galleria'), [])
+
+
+class PhotoVariantTests(TestCase):
+    def test_variant_names_follow_the_full_photo_name(self):
+        names = {
+            variant_name(photo, 200, 'webp')
+            for photo in ('bag_photos/gucci.jpg', 'bag_photos/gucci.png', 'bag_photos/2026/gucci.jpg')
+        }
+        self.assertEqual(len(names), 3)
+
+    def test_variants_are_generated_after_commit(self):
+        with mock.patch('store.models.generate_variants_safely') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                Bag.objects.create(brand='Prada', model_name='Galleria', price=9000, amount=1,
+                                   photo='bag_photos/galleria.jpg')
+                generate.assert_not_called()
+        generate.assert_called_once_with('bag_photos/galleria.jpg')
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bag = Bag.objects.create(brand='Prada', model_name='Galleria', size=2, price=9000, amount=1)
+
+    def bump_in_another_process(self):
+        """Bump the stored version without touching this process' cache, then
+        let the locally cached copy expire as CATALOG_VERSION_TTL would."""
+        CatalogVersion.objects.update(version=F('version') + 1)
+        cache.delete(CATALOG_VERSION_KEY)
+
+    def test_etag_follows_bumps_from_other_processes(self):
+        for name in ('store:api-bags-list', 'store:api-async-bags-list'):
+            with self.subTest(url=name):
+                url = reverse(name)
+                response = self.client.get(url)
+                etag = response['ETag']
+                self.assertFalse(response.has_header('Last-Modified'))
+                self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+                self.bump_in_another_process()
+                response = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_pages_follow_bumps_from_other_processes(self):
+        for name in ('store:api-bags-list', 'store:api-async-bags-list', 'store:medium-bags'):
+            with self.subTest(url=name):
+                Bag.objects.filter(pk=self.bag.pk).update(model_name='Galleria')
+                self.bump_in_another_process()
+                self.assertContains(self.client.get(reverse(name)), 'Galleria')
+
+                Bag.objects.filter(pk=self.bag.pk).update(model_name='Cleo')
+                self.assertContains(self.client.get(reverse(name)), 'Galleria')
+                self.bump_in_another_process()
+                self.assertContains(self.client.get(reverse(name)), 'Cleo')
+
+
+class CatalogQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Repeated prices, so price sorts have to break ties by id.
+        prices = [3000, 1000, 2000, 1000, 3000, 1000, 2000]
+        self.bags = Bag.objects.bulk_create([
+            Bag(brand='Gucci', model_name=f'Marmont {i}', size=i % 3 + 1, color=i % 2 + 1,
+                fabric=i % 3 + 1, price=price, amount=1)
+            for i, price in enumerate(prices)
+        ])
+
+    def ids(self, **params):
+        response = self.client.get(reverse('store:api-bags-list'), {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return [bag['id'] for bag in response.json()['results']]
+
+    def walk(self, url, direction):
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([bag['id'] for bag in data['results']])
+            url = data[direction]
+        return pages
+
+    def test_cursors_visit_every_bag_once_in_each_sort(self):
+        keys = {
+            'id': lambda bag: bag.id,
+            'newest': lambda bag: -bag.id,
+            'price': lambda bag: (bag.price, bag.id),
+            '-price': lambda bag: (-bag.price, -bag.id),
+        }
+        self.assertEqual(keys.keys(), SORT_ORDERINGS.keys())
+        for sort, key in keys.items():
+            with self.subTest(sort=sort):
+                expected = [bag.id for bag in sorted(self.bags, key=key)]
+                forward = self.walk(f"{reverse('store:api-bags-list')}?sort={sort}&page_size=2", 'next')
+                self.assertEqual([bag_id for page in forward for bag_id in page], expected)
+
+                last_page = f"{reverse('store:api-bags-list')}?sort={sort}&page_size=2"
+                for _ in forward[1:]:
+                    last_page = self.client.get(last_page).json()['next']
+                backward = self.walk(last_page, 'previous')
+                self.assertEqual(backward, forward[::-1])
+
+        forged = base64.b64encode(b'p=cheap,1').decode()
+        self.assertEqual(self.client.get(reverse('store:api-bags-list'), {'sort': 'price', 'cursor': forged}).status_code, 404)
+
+    def test_each_filter_narrows_the_catalog(self):
+        cases = {
+            'price_min': ({'price_min': 2000}, lambda bag: bag.price >= 2000),
+            'price_max': ({'price_max': 1000}, lambda bag: bag.price <= 1000),
+            'price range': ({'price_min': 2000, 'price_max': 2000}, lambda bag: bag.price == 2000),
+            'color by id': ({'color': COLOR.white}, lambda bag: bag.color == COLOR.white),
+            'color by name': ({'color': 'beige'}, lambda bag: bag.color == COLOR.beige),
+            'fabric': ({'fabric': 'cotton'}, lambda bag: bag.fabric == FABRIC.cotton),
+            'size': ({'size': 'midi'}, lambda bag: bag.size == SIZE.midi),
+            'size and color': ({'size': 1, 'color': 1}, lambda bag: bag.size == 1 and bag.color == 1),
+        }
+        for case, (params, matches) in cases.items():
+            with self.subTest(case):
+                expected = [bag.id for bag in self.bags if matches(bag)]
+                self.assertTrue(expected)
+                self.assertEqual(self.ids(**params), expected)
+
+    def test_invalid_filter_values_are_rejected(self):
+        cases = [
+            {'price_min': 'cheap'}, {'price_min': -1}, {'price_max': '1.5'},
+            {'price_min': 3000, 'price_max': 1000}, {'color': 'teal'}, {'color': 99},
+            {'fabric': 'silk'}, {'size': 0}, {'sort': 'brand'},
+        ]
+        for params in cases:
+            for name in ('store:api-bags-list', 'store:api-async-bags-list', 'store:main-page'):
+                with self.subTest(url=name, **params):
+                    self.assertEqual(self.client.get(reverse(name), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('store:api-bags-big'), {'color': ''}).status_code, 200)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    STORE_LOGIN_THROTTLE_DB=':memory:'
+)
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        login_limiter.reset()
+        self.user = User.objects.create_user('ola', password='secret-pass-2')
+        self.token = Token.objects.get(user=self.user)
+
+    def get_cart(self, key):
+        return Client().get(reverse('store:api-cart'), HTTP_AUTHORIZATION=f'Token {key}')
+
+    def test_repeat_calls_skip_the_token_query(self):
+        self.assertEqual(self.get_cart(self.token.key).status_code, 200)
+        with QueryRecorder() as recorder:
+            self.assertEqual(self.get_cart(self.token.key).status_code, 200)
+        self.assertFalse(any('authtoken_token' in sql for sql in recorder.fingerprints))
+
+    def test_deactivation_evicts_the_token(self):
+        self.get_cart(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_cart(self.token.key).status_code, 401)
+
+    def test_last_login_updates_keep_the_token_cached(self):
+        self.get_cart(self.token.key)
+        update_last_login(None, self.user)
+        self.assertEqual(len(token_cache), 1)
+        self.user.save()
+        self.assertEqual(len(token_cache), 0)
+
+    @override_settings(STORE_TOKEN_CACHE_SIZE=2)
+    def test_user_index_follows_evictions(self):
+        other = User.objects.create_user('ewa', password='secret-pass-3')
+        token_cache.set('a', self.user, self.token)
+        token_cache.set('b', other, self.token)
+        token_cache.set('c', self.user, self.token)
+        self.assertIsNone(token_cache.get('a'))
+        token_cache.invalidate_user(self.user.pk)
+        self.assertIsNone(token_cache.get('c'))
+        self.assertIsNotNone(token_cache.get('b'))
+        self.assertEqual(token_cache._keys_by_user, {other.pk: {'b'}})
+
+    def test_rotation_revokes_the_old_token(self):
+        self.get_cart(self.token.key)
+        client = Client()
+        response = client.post(reverse('store:api-token-rotate'), HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_cart(self.token.key).status_code, 401)
+        self.assertEqual(self.get_cart(response.json()['token']).status_code, 200)
+
+    @override_settings(STORE_TOKEN_EXPIRY=60)
+    def test_expired_token_is_rejected_and_replaced_on_login(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.get_cart(self.token.key).status_code, 401)
+        response = Client().post(reverse('store:api-token'), {'username': 'ola', 'password': 'secret-pass-2'})
+        self.assertNotEqual(response.json()['token'], self.token.key)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserProvisioningTests(TestCase):
+    def test_valid_rows_are_created_and_bad_rows_reported(self):
+        User.objects.create_user('ola', email='ola@example.com', password='secret-pass-2')
+        rows = enumerate([
+            {'username': 'firma1', 'email': 'Firma1@Example.com', 'password': ' secret-pass-3 ',
+             'name': 'Firma', 'zip_code': '31-000', 'country': 'pl', 'phone_number': '+48123456789'},
+            {'username': 'firma2', 'email': 'firma2@example.com', 'password': ''},
+            {'username': 'ola', 'email': 'ola2@example.com', 'password': 'x'},
+            {'username': 'firma3', 'email': 'firma1@example.com', 'password': 'x'},
+            {'username': 'firma4', 'email': 'not-an-email', 'name': 'lowercase'},
+        ], 1)
+        provisioner = UserProvisioner(batch_size=2).run(rows)
+
+        self.assertEqual(provisioner.created, 2)
+        self.assertEqual(
+            {error['row']: sorted(error['errors']) for error in provisioner.errors},
+            {3: ['username'], 4: ['email'], 5: ['email', 'name']}
+        )
+        account = User_acc.objects.select_related('django_user').get(django_user__username='firma1')
+        self.assertEqual((account.email, account.name, account.country.code), ('firma1@example.com', 'Firma', 'PL'))
+        self.assertTrue(account.django_user.check_password(' secret-pass-3 '))
+        self.assertFalse(account.django_user.check_password('secret-pass-3'))
+        self.assertFalse(User.objects.get(username='firma2').has_usable_password())
+        self.assertEqual(Token.objects.filter(user__username__in=['firma1', 'firma2']).count(), 2)
+
+
+class BagImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+
+    def import_csv(self, *lines, **options):
+        path = os.path.join(self.dir, 'bags.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(['brand,model_name,size,color,fabric,price,amount', *lines]) + '\n')
+        out = StringIO()
+        call_command('import_bags', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_rows_upsert_on_brand_and_model_name(self):
+        marmont = Bag.objects.create(brand='Gucci', model_name='Marmont', size=1, color=1, price=1000, amount=1)
+        self.import_csv(
+            'Gucci,Marmont,maxi,black,canvas,1200,4',
+            'Gucci,Jackie,mini,3,cotton,3000,2',
+            'Prada,Marmont,midi,red,nylon,900,1',
+        )
+        self.assertEqual(Bag.objects.count(), 3)
+        marmont.refresh_from_db()
+        self.assertEqual(
+            (marmont.size, marmont.color, marmont.fabric, marmont.price, marmont.amount),
+            (SIZE.maxi, COLOR.black, FABRIC.canvas, 1200, 4)
+        )
+        self.assertEqual(Bag.objects.get(model_name='Jackie').color, COLOR.brown)
+
+        # A later row for the same bag wins, within a batch and across batches.
+        for batch_size in (10, 1):
+            with self.subTest(batch_size=batch_size):
+                self.import_csv(
+                    'Gucci,Marmont,maxi,black,canvas,1300,5',
+                    'Gucci,Marmont,maxi,black,canvas,1400,6',
+                    batch_size=batch_size,
+                )
+                self.assertEqual(Bag.objects.count(), 3)
+                self.assertEqual(Bag.objects.values_list('price', 'amount').get(pk=marmont.pk), (1400, 6))
+
+    @override_settings(STORE_IMPORT_BATCH_SIZE=2)
+    def test_error_report_lists_each_bad_row(self):
+        report = os.path.join(self.dir, 'errors.ndjson')
+        out = self.import_csv(
+            'Gucci,Marmont,mini,black,canvas,1200,4',
+            'gucci,Jackie,mini,black,canvas,1200,4',
+            'Gucci,Dionysus,huge,teal,canvas,0,1',
+            'Gucci,Horsebit,mini,black,canvas,12.5,',
+            'Gucci,Ophidia,mini,black,canvas,800,2',
+            'Gucci,Ophidia,mini,black,canvas,850,3',
+            errors=report,
+        )
+        self.assertIn('Imported 2 bag(s); 4 row(s) with errors.', out)
+        with open(report, encoding='utf-8') as f:
+            errors = [json.loads(line) for line in f]
+        self.assertEqual(errors, [
+            {'row': 2, 'errors': {'brand': ['Brand must start with an uppercase letter.']}},
+            {'row': 3, 'errors': {
+                'size': ['"huge" is not a valid choice.'],
+                'color': ['"teal" is not a valid choice.'],
+                'price': ['Price must be greater than zero.'],
+            }},
+            {'row': 4, 'errors': {'price': ['A valid integer is required.'], 'amount': ['A valid integer is required.']}},
+            {'row': 5, 'errors': {'non_field_errors': ['Superseded by row 6 with the same brand and model_name.']}},
+        ])
+        self.assertEqual(Bag.objects.get(model_name='Ophidia').price, 850)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SeedStoreTests(TestCase):
+    def test_seeded_rows_are_consistent(self):
+        started = timezone.now()
+        call_command('seed_store', bags=20, users=5, orders=10, days=30, seed=1, stdout=StringIO())
+
+        self.assertEqual(
+            [model.objects.count() for model in (Bag, User, User_acc, Token, Order, OrderSummary)],
+            [20, 5, 5, 5, 10, 10]
+        )
+        self.assertEqual(Cart.objects.count(), round(5 * 0.3))
+        self.assertFalse(carts_with_drift().exists())
+        self.assertFalse(Cart.objects.filter(items__isnull=True).exists())
+
+        self.assertEqual(OrderItem.objects.count(), OrderSummaryItem.objects.count())
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total_price, sum(item.quantity * item.price_at_time for item in order.items.all()))
+        for model in (Order, OrderSummary):
+            oldest, newest = model.objects.aggregate(Min('created_at'), Max('created_at')).values()
+            self.assertGreaterEqual(oldest, started - timedelta(days=30))
+            self.assertLess(oldest, started - timedelta(days=1))
+            self.assertLessEqual(newest, timezone.now())
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    STORE_LOGIN_THROTTLE_DB=':memory:',
+    STORE_LOGIN_THROTTLE_RATES={'ip': (5, 60), 'username': (3, 300)}
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        login_limiter.reset()
+        User.objects.create_user('ola', password='secret-pass-2')
+
+    def post_token(self, password, ip='10.0.0.1', username='ola'):
+        return Client(REMOTE_ADDR=ip).post(reverse('store:api-token'), {'username': username, 'password': password})
+
+    def test_username_window_refuses_before_authenticating(self):
+        for _ in range(3):
+            self.assertEqual(self.post_token('wrong').status_code, 400)
+        with QueryRecorder() as recorder:
+            response = self.post_token('secret-pass-2', ip='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(recorder.count, 0)
+
+    def test_successful_login_clears_the_username_window(self):
+        self.post_token('wrong')
+        self.post_token('wrong')
+        self.assertEqual(self.post_token('secret-pass-2').status_code, 200)
+        self.assertEqual(self.post_token('wrong').status_code, 400)
+
+    def test_ip_window_covers_the_login_page(self):
+        client = Client(REMOTE_ADDR='10.0.0.3')
+        for i in range(5):
+            client.post(reverse('store:login-page'), {'username': f'user{i}', 'password': 'x'})
+        response = client.post(reverse('store:login-page'), {'username': 'ola', 'password': 'secret-pass-2'})
+        self.assertEqual(response.status_code, 429)
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.bags = Bag.objects.bulk_create([
+            Bag(brand='Gucci', model_name=f'Marmont {i}', size=1, price=1000 + i, amount=10)
+            for i in range(3)
+        ])
+        self.user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(self.user)
+
+    def place_order(self):
+        cart, _ = Cart.objects.get_or_create(user_cart=self.user.user_acc)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, bag=bag, quantity=2, price_at_time=bag.price) for bag in self.bags[:2]
+        ])
+        Cart.objects.filter(pk=cart.pk).update(total_price=2 * (self.bags[0].price + self.bags[1].price), item_count=4)
+        self.assertEqual(self.client.post(reverse('store:checkout'), CHECKOUT_DATA).status_code, 200)
+
+    def test_checkout_persists_order_lines(self):
+        self.place_order()
+        order = Order.objects.get()
+        self.assertEqual(
+            list(order.items.order_by('bag_id').values_list('bag_id', 'quantity', 'price_at_time')),
+            [(bag.id, 2, bag.price) for bag in self.bags[:2]]
+        )
+
+    def test_orders_are_charged_from_their_items(self):
+        cart = Cart.objects.create(user_cart=self.user.user_acc, total_price=1, item_count=1)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, bag=bag, quantity=2, price_at_time=bag.price) for bag in self.bags[:2]
+        ])
+        expected = 2 * (self.bags[0].price + self.bags[1].price)
+        self.client.get(reverse('store:order-summary'))
+        self.assertEqual(OrderSummary.objects.get().total_price, expected)
+        self.assertEqual(self.client.post(reverse('store:checkout'), CHECKOUT_DATA).status_code, 200)
+        self.assertEqual(Order.objects.get().total_price, expected)
+
+    def test_deleted_bags_are_reported_as_out_of_stock(self):
+        cart = Cart.objects.create(user_cart=self.user.user_acc)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, bag=bag, quantity=1, price_at_time=bag.price) for bag in self.bags
+        ])
+        items = list(cart.items.select_related('bag').order_by('bag_id'))
+        self.bags[1].delete()
+
+        with self.assertRaises(OutOfStock) as raised:
+            decrement_stock(items)
+        self.assertEqual(
+            [(str(s.bag), s.requested, s.available) for s in raised.exception.shortages],
+            [('Gucci Marmont 1', 1, 0)]
+        )
+        self.assertEqual(Bag.objects.get(pk=self.bags[0].pk).amount, 10)
+
+    def test_history_queries_do_not_grow_with_orders(self):
+        def history(count):
+            orders = Order.objects.bulk_create([
+                Order(user=self.user.user_acc, total_price=100) for _ in range(count)
+            ])
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, bag=bag, quantity=1, price_at_time=bag.price)
+                for order in orders for bag in self.bags
+            ])
+            with QueryRecorder() as recorder:
+                response = self.client.get(reverse('store:api-orders'))
+            return response.json(), recorder.count
+
+        self.client.get(reverse('store:api-orders'))  # caches the account in the session
+        page, small = history(2)
+        self.assertEqual(len(page['results'][0]['items']), 3)
+        page, large = history(40)
+        self.assertEqual(small, large)
+        self.assertEqual(len(page['results']), 20)
+        self.assertIsNotNone(page['next'])
+        self.assertGreater(page['results'][0]['id'], page['results'][-1]['id'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.bags = Bag.objects.bulk_create([
+            Bag(brand=brand, model_name=f'Marmont {i}', size=1, color=4, price=1000 * (i + 1), amount=10)
+            for i, brand in enumerate(['Gucci', 'Gucci', 'Prada'])
+        ])
+        self.user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(self.user)
+
+    def checkout(self, *lines):
+        cart, _ = Cart.objects.get_or_create(user_cart=self.user.user_acc)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, bag=bag, quantity=quantity, price_at_time=bag.price) for bag, quantity in lines
+        ])
+        Cart.objects.filter(pk=cart.pk).update(
+            total_price=sum(bag.price * quantity for bag, quantity in lines),
+            item_count=sum(quantity for _, quantity in lines)
+        )
+        self.assertEqual(self.client.post(reverse('store:checkout'), CHECKOUT_DATA).status_code, 200)
+
+    def rollups(self):
+        return [
+            sorted(model.objects.values_list(*fields, 'revenue', 'units', 'orders'))
+            for model, fields in (
+                (DailySales, ['day']),
+                (DailyBagSales, ['day', 'bag']),
+                (DailyCategorySales, ['day', 'brand', 'size', 'color', 'fabric']),
+            )
+        ]
+
+    def test_checkout_adds_to_rollups_and_rebuild_agrees(self):
+        self.checkout((self.bags[0], 2), (self.bags[2], 1))
+        self.checkout((self.bags[0], 1), (self.bags[1], 1))
+        today = timezone.localdate()
+
+        self.assertEqual(DailySales.objects.values_list('revenue', 'units', 'orders').get(day=today), (8000, 5, 2))
+        self.assertEqual(
+            DailyCategorySales.objects.values_list('revenue', 'units', 'orders').get(brand='Gucci'), (5000, 4, 2)
+        )
+        incremental = self.rollups()
+        rebuild_days(today - timedelta(days=1), today)
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_backfill_refuses_days_with_orders_without_lines(self):
+        self.checkout((self.bags[0], 2))
+        Order.objects.create(user=self.user.user_acc, total_price=500)
+        today = timezone.localdate().isoformat()
+
+        with self.assertRaisesMessage(CommandError, '1 order(s)'):
+            call_command('backfill_sales_rollups', stdout=StringIO())
+        self.assertEqual(DailySales.objects.values_list('orders', flat=True).get(), 1)
+        call_command('backfill_sales_rollups', start=today, allow_orders_without_lines=True,
+                     stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(DailySales.objects.values_list('revenue', 'orders').get(), (2000, 1))
+
+    def test_canceling_orders_updates_rollups(self):
+        self.checkout((self.bags[0], 2))
+        self.checkout((self.bags[2], 1))
+        first, second = Order.objects.order_by('pk')
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, is_superuser=True)
+
+        def set_status(action, order):
+            response = self.client.post(reverse('admin:store_order_changelist'), {
+                'action': action, '_selected_action': [order.pk],
+            })
+            self.assertEqual(response.status_code, 302)
+            return DailySales.objects.values_list('revenue', 'units', 'orders').get()
+
+        self.assertEqual(set_status('mark_canceled', first), (3000, 1, 1))
+        self.assertEqual(DailyBagSales.objects.get().bag_id, self.bags[2].pk)
+        self.assertEqual(set_status('mark_sent', first), (5000, 3, 2))
+        response = self.client.post(reverse('admin:store_order_change', args=[second.pk]), {
+            'status': Order.Status.CANCELED, 'items-TOTAL_FORMS': 1, 'items-INITIAL_FORMS': 1,
+            'items-0-id': second.items.get().pk, 'items-0-order': second.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(DailySales.objects.values_list('revenue', 'units', 'orders').get(), (2000, 2, 1))
+
+    def test_report_groups_and_totals(self):
+        self.checkout((self.bags[0], 2), (self.bags[2], 1))
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('store:api-reports-sales'), {'group_by': 'brand'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals'], {'revenue': 5000, 'units': 3, 'orders': 1})
+        self.assertEqual(
+            [(row['brand'], row['revenue']) for row in response.json()['results']],
+            [('Prada', 3000), ('Gucci', 2000)]
+        )
+        response = self.client.get(reverse('store:api-reports-sales'), {'group_by': 'bag,color'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CartTotalsTests(TestCase):
+    def setUp(self):
+        self.bags = Bag.objects.bulk_create([
+            Bag(brand='Gucci', model_name=f'Marmont {i}', size=1, price=1000 * (i + 1), amount=10)
+            for i in range(2)
+        ])
+        self.user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user_cart=self.user.user_acc)
+
+    def add(self, bag, quantity):
+        self.client.post(reverse('store:bag-detail-html', args=[bag.id]), {'quantity': quantity})
+
+    def totals(self):
+        return Cart.objects.values_list('total_price', 'item_count').get(pk=self.cart.pk)
+
+    def test_removing_an_untracked_item_does_not_underflow(self):
+        item = CartItem.objects.create(cart=self.cart, bag=self.bags[0], quantity=2, price_at_time=1000)
+        response = self.client.get(reverse('store:remove-from-cart', args=[item.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.totals(), (0, 0))
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_deleting_a_bag_takes_it_out_of_cart_totals(self):
+        self.add(self.bags[0], 2)
+        self.add(self.bags[1], 1)
+        self.assertEqual(self.totals(), (4000, 3))
+        self.bags[0].delete()
+        self.assertEqual(self.totals(), (2000, 1))
+
+    def test_admin_cart_items_are_read_only(self):
+        self.add(self.bags[0], 1)
+        self.client.force_login(User.objects.create_superuser('ewa', 'ewa@example.com', 'secret-pass-4'))
+        item = CartItem.objects.get()
+        self.assertEqual(self.client.get(reverse('admin:store_cartitem_add')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:store_cartitem_delete', args=[item.pk])).status_code, 403)
+        response = self.client.post(reverse('admin:store_cartitem_change', args=[item.pk]), {'quantity': 5})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:store_cart_change', args=[self.cart.pk])).status_code, 200)
+        self.assertEqual((CartItem.objects.get().quantity, self.totals()), (1, (1000, 1)))
+
+    def test_repair_cart_totals(self):
+        self.add(self.bags[0], 2)
+        Cart.objects.filter(pk=self.cart.pk).update(total_price=1, item_count=7)
+
+        out = StringIO()
+        call_command('repair_cart_totals', dry_run=True, stdout=out)
+        self.assertIn(f'Cart {self.cart.pk}: stored 1 zł / 7 item(s), actual 2000 zł / 2 item(s)', out.getvalue())
+        self.assertEqual(self.totals(), (1, 7))
+
+        call_command('repair_cart_totals', stdout=StringIO())
+        self.assertEqual(self.totals(), (2000, 2))
+        out = StringIO()
+        call_command('repair_cart_totals', stdout=out)
+        self.assertIn('Repaired 0 cart(s)', out.getvalue())
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.bags = Bag.objects.bulk_create([
+            Bag(brand='Gucci', model_name=f'Marmont {i}', size=1, price=1000 * (i + 1), amount=10)
+            for i in range(2)
+        ])
+        self.user = User.objects.create_user('anna', password='secret-pass-1')
+        self.client.force_login(self.user)
+
+    def batch(self, *operations):
+        return self.client.post(
+            reverse('store:api-cart-batch'), {'operations': list(operations)}, content_type='application/json'
+        )
+
+    def cart_state(self):
+        cart = Cart.objects.get(user_cart=self.user.user_acc)
+        items = dict(cart.items.values_list('bag_id', 'quantity'))
+        return items, (cart.total_price, cart.item_count)
+
+    def test_invalid_batches_are_rejected(self):
+        first, second = self.bags
+        self.batch({'op': 'add', 'bag': first.id, 'quantity': 2})
+        before = self.cart_state()
+        cases = {
+            'unknown bag': [{'op': 'add', 'bag': 9999, 'quantity': 1}],
+            'missing quantity': [{'op': 'set', 'bag': second.id}],
+            'empty list': [],
+            'over stock': [{'op': 'set', 'bag': second.id, 'quantity': 11}],
+        }
+        for case, operations in cases.items():
+            with self.subTest(case):
+                response = self.batch(*operations)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('operations', response.json())
+                self.assertEqual(self.cart_state(), before)
+
+    def test_stock_is_checked_against_the_summed_quantity(self):
+        bag = self.bags[0]
+        response = self.batch(
+            {'op': 'add', 'bag': bag.id, 'quantity': 6},
+            {'op': 'add', 'bag': bag.id, 'quantity': 5},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['operations'], [
+            {}, {'quantity': ['Available quantity for this product is: 10.']},
+        ])
+
+        response = self.batch(
+            {'op': 'add', 'bag': bag.id, 'quantity': 6},
+            {'op': 'add', 'bag': bag.id, 'quantity': 4},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cart_state(), ({bag.id: 10}, (10000, 10)))
+
+    def test_a_failing_operation_writes_nothing(self):
+        first, second = self.bags
+        self.batch({'op': 'add', 'bag': first.id, 'quantity': 2})
+        before = self.cart_state()
+        response = self.batch(
+            {'op': 'set', 'bag': first.id, 'quantity': 5},
+            {'op': 'add', 'bag': second.id, 'quantity': 1},
+            {'op': 'add', 'bag': 9999, 'quantity': 1},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['operations'], [{}, {}, {'bag': ['Bag does not exist.']}])
+        self.assertEqual(self.cart_state(), before)
+
+    def test_returns_the_updated_cart_and_totals(self):
+        first, second = self.bags
+        self.batch({'op': 'add', 'bag': first.id, 'quantity': 2})
+        response = self.batch(
+            {'op': 'add', 'bag': second.id, 'quantity': 3},
+            {'op': 'set', 'bag': first.id, 'quantity': 1},
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['total_price'], body['item_count']), (7000, 4))
+        self.assertEqual({item['bag']: item['quantity'] for item in body['items']}, {first.id: 1, second.id: 3})
+        self.assertEqual(self.cart_state(), ({first.id: 1, second.id: 3}, (7000, 4)))
+
+        body = self.batch({'op': 'remove', 'bag': second.id}).json()
+        self.assertEqual((body['total_price'], body['item_count'], len(body['items'])), (1000, 1, 1))
+
+
+class OrderExportTests(TestCase):
+    def test_streamed_queries_are_bounded_by_chunks(self):
+        bag = Bag.objects.create(brand='Prada', model_name='Galleria', price=9000, amount=1)
+        staff = User.objects.create_user('ewa', password='secret-pass-3', is_staff=True)
+        rows = 23
+        orders = Order.objects.bulk_create([Order(user=staff.user_acc, total_price=9000) for _ in range(rows)])
+        OrderItem.objects.bulk_create([OrderItem(order=o, bag=bag, quantity=1, price_at_time=9000) for o in orders])
+        summaries = OrderSummary.objects.bulk_create([
+            OrderSummary(user=staff.user_acc, total_price=9000) for _ in range(rows)
+        ])
+        OrderSummaryItem.objects.bulk_create([
+            OrderSummaryItem(summary=s, bag=bag, quantity=1, price_at_time=9000) for s in summaries
+        ])
+        self.client.force_login(staff)
+
+        with mock.patch('store.exports.CHUNK_SIZE', 5):
+            for kind in ('orders', 'order_lines', 'summaries'):
+                with self.subTest(kind=kind):
+                    response = self.client.get(reverse('store:api-export-orders'), {'kind': kind})
+                    # The middleware has returned; these queries run while streaming.
+                    with QueryRecorder() as recorder:
+                        lines = b''.join(response.streaming_content).splitlines()
+                    self.assertEqual(len(lines), rows)
+                    # One SELECT, plus one prefetch per chunk for summaries.
+                    self.assertLessEqual(recorder.count, 1 + math.ceil(rows / 5))
+
+
+class StoreAdminTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_superuser('ewa', 'ewa@example.com', 'secret-pass-4')
+        self.client.force_login(self.staff)
+
+    def create_orders(self, count):
+        start = User.objects.count()
+        users = [User.objects.create(username=f'buyer{start + i}') for i in range(count)]
+        return Order.objects.bulk_create([Order(user=user.user_acc, total_price=100) for user in users])
+
+    def test_order_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:store_order_changelist')
+        self.create_orders(3)
+        with QueryRecorder() as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_orders(20)
+        with QueryRecorder() as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(small.count, large.count)
+
+    def test_row_estimate_uses_sqlite_statistics(self):
+        orders = self.create_orders(30)
+        Order.objects.filter(pk__in=[order.pk for order in orders[1:-1]]).delete()
+        self.assertEqual(estimated_row_count(Order), 30)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_row_count(Order), 2)
+
+    def test_status_actions_update_in_chunks(self):
+        orders = self.create_orders(5)
+        Order.objects.filter(pk=orders[0].pk).update(status=Order.Status.SENT)
+        with QueryRecorder() as recorder:
+            updated = update_in_chunks(Order.objects.exclude(status=Order.Status.SENT), chunk_size=2,
+                                       status=Order.Status.SENT)
+        self.assertEqual(updated, 4)
+        self.assertEqual(sum(n for sql, n in recorder.fingerprints.items() if sql.startswith('UPDATE')), 2)
+
+        response = self.client.post(reverse('admin:store_order_changelist'), {
+            'action': 'mark_done', '_selected_action': [order.pk for order in orders[:2]],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(status=Order.Status.DONE).count(), 2)
@@ -0,0 +1,134 @@
+"""Admission control for login and token endpoints.
+
+Every attempt is checked against sliding windows per client IP and per
+username *before* the password is hashed, so a flood of guesses costs a
+few SQLite statements instead of a PBKDF2 run each. The attempt log lives
+in a small SQLite file on local disk (STORE_LOGIN_THROTTLE_DB), separate
+from the main database, so all worker processes on a host share the same
+windows. If the file can't be used the check fails open.
+"""
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATES = {
+    'ip': (30, 60),
+    'username': (10, 300),
+}
+PRUNE_PROBABILITY = 0.01
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (scope TEXT NOT NULL, key TEXT NOT NULL, ts REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS attempts_scope_key_ts ON attempts (scope, key, ts);
+"""
+
+
+class SlidingWindowLimiter:
+    """Sliding-window log of attempts in a SQLite file, one connection per thread."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        path = str(getattr(settings, 'STORE_LOGIN_THROTTLE_DB', ':memory:'))
+        connections = self._local.__dict__.setdefault('connections', {})
+        conn = connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+            if path != ':memory:':
+                conn.execute('PRAGMA journal_mode=WAL')
+            # Losing the last few attempts on a crash is harmless.
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.executescript(SCHEMA)
+            connections[path] = conn
+        return conn
+
+    def hit(self, rules, now=None):
+        """Record an attempt against every (scope, key, limit, window) rule.
+
+        Returns a list of (scope, retry_after seconds) for the rules that are
+        already at their limit; the attempt is recorded only if none are.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            blocked = []
+            for scope, key, limit, window in rules:
+                count, oldest = conn.execute(
+                    'SELECT COUNT(*), MIN(ts) FROM attempts WHERE scope = ? AND key = ? AND ts > ?',
+                    (scope, key, now - window)
+                ).fetchone()
+                if count >= limit:
+                    blocked.append((scope, max(1, math.ceil(oldest + window - now))))
+            if not blocked:
+                conn.executemany(
+                    'INSERT INTO attempts (scope, key, ts) VALUES (?, ?, ?)',
+                    [(scope, key, now) for scope, key, _, _ in rules]
+                )
+            if rules and random.random() < PRUNE_PROBABILITY:
+                conn.execute('DELETE FROM attempts WHERE ts <= ?', (now - max(rule[3] for rule in rules),))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return blocked
+
+    def clear(self, scope, key):
+        self._connection().execute('DELETE FROM attempts WHERE scope = ? AND key = ?', (scope, key))
+
+    def reset(self):
+        self._connection().execute('DELETE FROM attempts')
+
+
+login_limiter = SlidingWindowLimiter()
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or 'unknown'
+
+
+def _rules(request, username):
+    rates = getattr(settings, 'STORE_LOGIN_THROTTLE_RATES', DEFAULT_RATES)
+    keys = {'ip': client_ip(request), 'username': (username or '').strip().lower()}
+    return [
+        (scope, keys[scope], limit, window)
+        for scope, (limit, window) in rates.items()
+        if keys.get(scope)
+    ]
+
+
+def check_login_attempt(request, username):
+    """Count a login attempt; return seconds to wait if it must be refused, else None."""
+    try:
+        blocked = login_limiter.hit(_rules(request, username))
+    except sqlite3.Error:
+        logger.exception('Login throttle unavailable; allowing the attempt.')
+        metrics.inc('store_login_throttle_total', result='error')
+        return None
+
+    if not blocked:
+        metrics.inc('store_login_throttle_total', result='allowed')
+        return None
+    metrics.inc('store_login_throttle_total', result='throttled')
+    for scope, _ in blocked:
+        metrics.inc('store_login_throttled_total', scope=scope)
+    return max(retry_after for _, retry_after in blocked)
+
+
+def login_succeeded(username):
+    """Forget the username's failed attempts; the IP window keeps counting."""
+    try:
+        login_limiter.clear('username', (username or '').strip().lower())
+    except sqlite3.Error:
+        logger.exception('Login throttle unavailable; could not clear attempts.')
@@ -9,14 +9,30 @@ urlpatterns = [
     path('api/bags/size/small/', views.bags_small, name='api-bags-small'),
     path('api/bags/size/medium/', views.bags_medium, name='api-bags-medium'),
     path('api/bags/size/big/', views.bags_big, name='api-bags-big'),
+    path('api/bags/search/', views.bags_search, name='api-bags-search'),
+    path('api/bags/import/', views.import_bags_view, name='api-bags-import'),
     
     path('api/auth/register/', views.register, name='api-register'),
     path('api/auth/login/', views.login_view, name='api-login'),
     path('api/auth/token/', views.get_auth_token, name='api-token'),
+    path('api/auth/token/rotate/', views.rotate_auth_token, name='api-token-rotate'),
     path('api/auth/logout/', views.logout_view, name='api-logout'),
+    path('api/users/provision/', views.provision_users_view, name='api-users-provision'),
     
     path('api/cart/', views.cart_view, name='api-cart'),
+    path('api/cart/batch/', views.cart_batch, name='api-cart-batch'),
+    path('api/cart/totals/', views.cart_totals, name='api-cart-totals'),
     path('api/order-summary/', views.summary_view, name='api-summary'),
+    path('api/orders/', views.order_history_view, name='api-orders'),
+    path('api/export/orders/', views.export_orders, name='api-export-orders'),
+    path('api/reports/sales/', views.sales_report_view, name='api-reports-sales'),
+    
+    path('api/async/bags/', views.bags_list_async, name='api-async-bags-list'),
+    path('api/async/bags/size/small/', views.bags_small_async, name='api-async-bags-small'),
+    path('api/async/bags/size/medium/', views.bags_medium_async, name='api-async-bags-medium'),
+    path('api/async/bags/size/big/', views.bags_big_async, name='api-async-bags-big'),
+    path('api/async/cart/', views.cart_view_async, name='api-async-cart'),
+    path('api/async/order-summary/', views.summary_view_async, name='api-async-summary'),
     
     path('', views.main_page, name='main-page'),
     path('login-page/', views.login_page, name='login-page'),
@@ -24,15 +40,19 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('account/', views.account_profile, name='account-profile'),
     path('account/edit/', views.edit_account, name='edit-account'),
+    path('account/orders/', views.order_history_page, name='account-orders'),
     
     path('bags/', views.bags_list_html, name='bags-list-html'),
     path('bags/<int:bag_id>/', views.bag_detail_html, name='bag-detail-html'),
     path('bags/size/small/', views.small_bags_page, name='small-bags'),
     path('bags/size/medium/', views.medium_bags_page, name='medium-bags'),
     path('bags/size/big/', views.big_bags_page, name='big-bags'),
+    path('search/', views.search_page, name='search'),
     
     path('cart/', views.cart_page, name='cart'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove-from-cart'),
     path('checkout/', views.checkout, name='checkout'),
     path('order-summary/', views.go_to_order_summary, name='order-summary'),
+    
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -1,73 +1,176 @@
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.request import Request
 from rest_framework.authtoken.models import Token
 
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
+from django.views.decorators.http import condition, require_GET
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
 
 from .models import Bag, Cart, CartItem, OrderSummary, OrderSummaryItem, Order, User_acc, COLOR
-from .serializers import BagSerializer, CartSerializer, OrderSummarySerializer
+from .serializers import BagSerializer, CartSerializer, CartBatchSerializer, OrderSummarySerializer, OrderSerializer
 from .forms import CheckoutForm, CustomUserCreationForm
 from .permissions import CanViewBag, CanViewCart, CanViewOrder
+from .pagination import BagCursorPagination, CatalogPage, OrderHistoryPagination
+from .catalog import filter_bags, parse_catalog_params, CatalogError
+from .search import build_match_query, search_bags, MAX_SEARCH_RESULTS
+from .orders import create_order_items, decrement_stock, order_history, OutOfStock
+from .carts import apply_cart_operations, adjust_cart_totals, clear_cart, get_cart, items_total, CartError
+from .accounts import get_user_acc
+from .authentication import aauthenticate_token, rotate_token, token_expired
+from .exports import export_lines, parse_export_params, ExportError
+from .reporting import parse_report_params, record_order, sales_report, ReportError
+from .imports import IMPORT_FORMATS, format_for, import_bags, read_rows, text_stream
+from .provisioning import UserProvisioner
+from .throttling import check_login_attempt, login_succeeded
+from . import metrics
+from .caching import (
+    catalog_cache_key,
+    acatalog_cache_key,
+    get_catalog_page,
+    aget_catalog_page,
+    set_catalog_page,
+    aset_catalog_page,
+    catalog_etag,
+    acatalog_etag
+)
+
+
+def _paginated_bags(request, size=None):
+    try:
+        filters = parse_catalog_params(request.query_params, size=size)
+    except CatalogError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    paginator = BagCursorPagination()
+    key = catalog_cache_key(
+        request,
+        filters,
+        request.query_params.get(paginator.cursor_query_param),
+        paginator.get_page_size(request)
+    )
+    data = get_catalog_page(request, key)
+    if data is None:
+        data = _serialize_bags_page(paginator, filters, request)
+        set_catalog_page(key, data)
+    return Response(data, status=status.HTTP_200_OK)
 
 
+def _serialize_bags_page(paginator, filters, request):
+    page = paginator.paginate_queryset(filter_bags(filters), request)
+    serializer = BagSerializer(page, many=True)
+    return dict(paginator.get_paginated_response(serializer.data).data)
+
+
+@condition(etag_func=catalog_etag)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def bags_list(request):
     if request.method == 'GET':
-        bags = Bag.objects.all()
-        serializer = BagSerializer(bags, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _paginated_bags(request)
 
 
+@condition(etag_func=catalog_etag)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def bags_small(request):
     if request.method == 'GET':
-        bags = Bag.objects.filter(size=1)
-        serializer = BagSerializer(bags, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _paginated_bags(request, size=1)
 
 
+@condition(etag_func=catalog_etag)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def bags_medium(request):
     if request.method == 'GET':
-        bags = Bag.objects.filter(size=2)
-        serializer = BagSerializer(bags, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _paginated_bags(request, size=2)
 
 
+@condition(etag_func=catalog_etag)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def bags_big(request):
     if request.method == 'GET':
-        bags = Bag.objects.filter(size=3)
-        serializer = BagSerializer(bags, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _paginated_bags(request, size=3)
+
+
+def _parse_search_limit(value, default=20):
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        return default
+    return max(1, min(limit, MAX_SEARCH_RESULTS))
+
+
+@condition(etag_func=catalog_etag)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bags_search(request):
+    if request.method == 'GET':
+        query = request.query_params.get('q', '')
+        limit = _parse_search_limit(request.query_params.get('limit'))
+        key = catalog_cache_key(request, {'q': build_match_query(query)}, None, limit)
+        data = get_catalog_page(request, key)
+        if data is None:
+            serializer = BagSerializer(search_bags(query, limit), many=True)
+            data = {'results': serializer.data}
+            set_catalog_page(key, data)
+        return Response(data, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def cart_view(request):
     if request.method == 'GET':
-        cart, _ = Cart.objects.get_or_create(user_cart=request.user.user_acc)
+        cart = get_cart(get_user_acc(request))
         serializer = CartSerializer(cart)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cart_batch(request):
+    serializer = CartBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    cart = get_cart(get_user_acc(request))
+    try:
+        apply_cart_operations(cart, serializer.validated_data['operations'])
+    except CartError as e:
+        return Response({'operations': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    
+    cart = Cart.objects.prefetch_related('items').get(pk=cart.pk)
+    return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cart_totals(request):
+    totals = Cart.objects.filter(user_cart=get_user_acc(request)).values('total_price', 'item_count').first()
+    return Response(totals or {'total_price': 0, 'item_count': 0}, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def summary_view(request):
     if request.method == 'GET':
-        summary = OrderSummary.objects.filter(user=request.user.user_acc).order_by('-created_at').first()
+        summary = OrderSummary.objects.filter(user=get_user_acc(request)).order_by('-created_at').first()
         if not summary:
             return Response(
                 {"error": "No summary found."}, 
@@ -77,6 +180,202 @@ def summary_view(request):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_history_view(request):
+    paginator = OrderHistoryPagination()
+    orders = paginator.paginate_queryset(order_history(get_user_acc(request)), request)
+    return paginator.get_paginated_response(OrderSerializer(orders, many=True).data)
+
+
+# Async versions of the read-heavy endpoints, for ASGI deployments. They
+# return the same JSON as their DRF counterparts; the DB work runs through
+# the async ORM, and the DRF paginator (sync only) through sync_to_async.
+
+async def _apaginated_bags(request, size=None):
+    drf_request = Request(request)
+    try:
+        filters = parse_catalog_params(drf_request.query_params, size=size)
+    except CatalogError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    paginator = BagCursorPagination()
+    key = await acatalog_cache_key(
+        request,
+        filters,
+        drf_request.query_params.get(paginator.cursor_query_param),
+        paginator.get_page_size(drf_request)
+    )
+    data = await aget_catalog_page(request, key)
+    if data is None:
+        data = await sync_to_async(_serialize_bags_page)(paginator, filters, drf_request)
+        await aset_catalog_page(key, data)
+    return JsonResponse(data)
+
+
+async def _aauthenticate(request):
+    """The active user behind a Token header or the session, or None."""
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if keyword == 'Token':
+        user = await aauthenticate_token(key.strip())
+    else:
+        user = await request.auser()
+    if user is None or not user.is_authenticated or not user.is_active:
+        return None
+    request.user = user
+    return user
+
+
+def _acatalog_condition(view):
+    """@condition(etag_func=catalog_etag) for async views.
+
+    Django calls etag_func synchronously even around async views, and the
+    catalog version may have to be read from the database.
+    """
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        etag = quote_etag(await acatalog_etag(request))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            response.headers.setdefault('ETag', etag)
+        return response
+    return inner
+
+
+def _unauthorized():
+    response = JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+@_acatalog_condition
+@require_GET
+async def bags_list_async(request):
+    return await _apaginated_bags(request)
+
+
+@_acatalog_condition
+@require_GET
+async def bags_small_async(request):
+    return await _apaginated_bags(request, size=1)
+
+
+@_acatalog_condition
+@require_GET
+async def bags_medium_async(request):
+    return await _apaginated_bags(request, size=2)
+
+
+@_acatalog_condition
+@require_GET
+async def bags_big_async(request):
+    return await _apaginated_bags(request, size=3)
+
+
+@require_GET
+async def cart_view_async(request):
+    if await _aauthenticate(request) is None:
+        return _unauthorized()
+    user_acc = await sync_to_async(get_user_acc)(request)
+    carts = Cart.objects.prefetch_related('items').filter(user_cart=user_acc)
+    cart = await carts.afirst()
+    if cart is None:
+        await Cart.objects.aget_or_create(user_cart=user_acc)
+        cart = await carts.aget()
+    return JsonResponse(CartSerializer(cart).data)
+
+
+@require_GET
+async def summary_view_async(request):
+    if await _aauthenticate(request) is None:
+        return _unauthorized()
+    user_acc = await sync_to_async(get_user_acc)(request)
+    summary = await OrderSummary.objects.filter(user=user_acc).order_by('-created_at').afirst()
+    if not summary:
+        return JsonResponse({"error": "No summary found."}, status=404)
+    return JsonResponse(OrderSummarySerializer(summary).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export_orders(request):
+    try:
+        options = parse_export_params(request.query_params)
+    except ExportError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if options['output'] == 'csv':
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        content_type = 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(export_lines(options), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{options["kind"]}.{options["output"]}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_report_view(request):
+    try:
+        options = parse_report_params(request.query_params)
+    except ReportError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(sales_report(options), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_bags_view(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response(
+            {"error": "Upload a CSV or NDJSON file in the 'file' field."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    file_format = request.data.get('file_format') or format_for(upload.name)
+    if file_format not in IMPORT_FORMATS:
+        return Response(
+            {"error": f"file_format must be one of: {', '.join(IMPORT_FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    importer = import_bags(text_stream(upload), file_format, dry_run=dry_run)
+    return Response(
+        {"imported": importer.imported, "errors": importer.errors},
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def provision_users_view(request):
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response(
+            {"error": "Upload a CSV or NDJSON file in the 'file' field."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    file_format = request.data.get('file_format') or format_for(upload.name)
+    if file_format not in IMPORT_FORMATS:
+        return Response(
+            {"error": f"file_format must be one of: {', '.join(IMPORT_FORMATS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+    # Threads rather than processes: PBKDF2 releases the GIL, and forking a
+    # web worker isn't safe. manage.py provision_users uses a process pool.
+    with ThreadPoolExecutor(max_workers=settings.STORE_PROVISION_HASH_THREADS) as pool:
+        provisioner = UserProvisioner(dry_run=dry_run, hash_map=pool.map)
+        provisioner.run(read_rows(text_stream(upload), file_format))
+    return Response(
+        {"created": provisioner.created, "errors": provisioner.errors},
+        status=status.HTTP_200_OK
+    )
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -109,8 +408,13 @@ def login_view(request):
     username = request.data.get("username")
     password = request.data.get("password")
     
+    retry_after = check_login_attempt(request, username)
+    if retry_after is not None:
+        return _too_many_attempts(retry_after)
+
     user = authenticate(request, username=username, password=password)
     if user is not None:
+        login_succeeded(username)
         login(request, user)
         return Response(
             {"success": True}, 
@@ -123,6 +427,14 @@ def login_view(request):
         )
 
 
+def _too_many_attempts(retry_after):
+    return Response(
+        {"error": "Too many login attempts. Try again later.", "retry_after": retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(retry_after)}
+    )
+
+
 @csrf_exempt
 def logout_view(request):
     if request.method in ['POST', 'GET']:
@@ -142,9 +454,16 @@ def get_auth_token(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    retry_after = check_login_attempt(request, username)
+    if retry_after is not None:
+        return _too_many_attempts(retry_after)
+
     user = authenticate(request, username=username, password=password)
     if user is not None:
+        login_succeeded(username)
         token, created = Token.objects.get_or_create(user=user)
+        if not created and token_expired(token.created):
+            token = rotate_token(user)
         return Response(
             {'token': token.key, 'user_id': user.id}, 
             status=status.HTTP_200_OK
@@ -156,25 +475,21 @@ def get_auth_token(request):
         )
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rotate_auth_token(request):
+    token = rotate_token(request.user)
+    return Response(
+        {'token': token.key, 'user_id': request.user.id},
+        status=status.HTTP_200_OK
+    )
+
+
 def main_page(request):
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('/admin/')
     
-    bags = Bag.objects.all()
-    selected_color = request.GET.get('color')
-    
-    if selected_color:
-        try:
-            color_id = int(selected_color)
-            bags = bags.filter(color=color_id)
-        except (ValueError, TypeError):
-            pass
-    
-    return render(request, "main.html", {
-        'bags': bags,
-        'color_choices': COLOR.choices,
-        'selected_color': selected_color
-    })
+    return _render_bags_page(request, "main.html")
 
 
 @csrf_protect
@@ -183,8 +498,19 @@ def login_page(request):
     if request.method == "POST":
         username = request.POST.get("username")
         password = request.POST.get("password")
+        retry_after = check_login_attempt(request, username)
+        if retry_after is not None:
+            response = render(
+                request, "account/login.html",
+                {"error": f"Too many login attempts. Try again in {retry_after} seconds."},
+                status=429
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+
         user = authenticate(request, username=username, password=password)
         if user is not None:
+            login_succeeded(username)
             login(request, user)
             return redirect("store:main-page")
         else:
@@ -225,24 +551,23 @@ def register_page(request):
     return render(request, 'account/register.html', {'form': form, 'error': error})
 
 
-def bags_list_html(request):
-    bags = Bag.objects.all()
-    selected_color = request.GET.get('color')
-    
-    if selected_color:
-        try:
-            color_id = int(selected_color)
-            bags = bags.filter(color=color_id)
-        except (ValueError, TypeError):
-            pass
-    
-    return render(request, "bag/detail.html", {
-        'bags': bags,
+def _render_bags_page(request, template, size=None, api_url_name='store:api-bags-list'):
+    try:
+        catalog = CatalogPage(request, reverse(api_url_name), size=size)
+    except CatalogError as e:
+        return HttpResponseBadRequest(str(e))
+    return render(request, template, {
+        'catalog': catalog,
+        'catalog_cache_timeout': settings.CATALOG_CACHE_TIMEOUT,
         'color_choices': COLOR.choices,
-        'selected_color': selected_color
+        'selected_color': request.GET.get('color')
     })
 
 
+def bags_list_html(request):
+    return _render_bags_page(request, "bag/detail.html")
+
+
 def bag_detail_html(request, bag_id):
     bag = get_object_or_404(Bag, id=bag_id)
     error = None
@@ -268,36 +593,26 @@ def bag_detail_html(request, bag_id):
             error = f'Not enough bags in stock. Available: {bag.amount}.'
         else:
             try:
-                user_acc, _ = User_acc.objects.get_or_create(
-                    django_user=request.user,
-                    defaults={
-                        'name': request.user.first_name or request.user.username,
-                        'surname': request.user.last_name or request.user.username,
-                        'email': request.user.email or f'{request.user.username}@example.com',
-                        'street_name': 'Not provided',
-                        'home_nr': '0',
-                        'city': 'Not provided',
-                        'zip_code': '00-000',
-                        'country': 'US',
-                        'phone_number': '+1234567890',
-                    }
-                )
-                cart, _ = Cart.objects.get_or_create(user_cart=user_acc)
-                item, created = CartItem.objects.get_or_create(
-                    cart=cart, 
-                    bag=bag, 
-                    defaults={'quantity': quantity, 'price_at_time': bag.price}
-                )
-                
-                if not created:
-                    if bag.amount < item.quantity + quantity:
-                        error = f'Not enough bags in stock. Available: {bag.amount - item.quantity}.'
+                user_acc = get_user_acc(request)
+                with transaction.atomic():
+                    cart = get_cart(user_acc)
+                    item, created = CartItem.objects.get_or_create(
+                        cart=cart, 
+                        bag=bag, 
+                        defaults={'quantity': quantity, 'price_at_time': bag.price}
+                    )
+                    
+                    if not created:
+                        if bag.amount < item.quantity + quantity:
+                            error = f'Not enough bags in stock. Available: {bag.amount - item.quantity}.'
+                        else:
+                            item.quantity += quantity
+                            item.save()
+                            adjust_cart_totals(cart, quantity * item.price_at_time, quantity)
+                            success = 'Added to cart successfully!'
                     else:
-                        item.quantity += quantity
-                        item.save()
+                        adjust_cart_totals(cart, quantity * item.price_at_time, quantity)
                         success = 'Added to cart successfully!'
-                else:
-                    success = 'Added to cart successfully!'
             except Exception as e:
                 error = f'Error adding to cart: {str(e)}'
     
@@ -308,58 +623,24 @@ def bag_detail_html(request, bag_id):
     })
 
 
-def small_bags_page(request):
-    bags = Bag.objects.filter(size=1)
-    selected_color = request.GET.get('color')
-    
-    if selected_color:
-        try:
-            color_id = int(selected_color)
-            bags = bags.filter(color=color_id)
-        except (ValueError, TypeError):
-            pass
-    
-    return render(request, "bag/small_bags.html", {
-        'bags': bags,
-        'color_choices': COLOR.choices,
-        'selected_color': selected_color
+def search_page(request):
+    query = request.GET.get('q', '').strip()
+    return render(request, "bag/search.html", {
+        'bags': search_bags(query) if query else [],
+        'query': query
     })
 
 
+def small_bags_page(request):
+    return _render_bags_page(request, "bag/small_bags.html", size=1, api_url_name='store:api-bags-small')
+
+
 def medium_bags_page(request):
-    bags = Bag.objects.filter(size=2)
-    selected_color = request.GET.get('color')
-    
-    if selected_color:
-        try:
-            color_id = int(selected_color)
-            bags = bags.filter(color=color_id)
-        except (ValueError, TypeError):
-            pass
-    
-    return render(request, "bag/medium_bags.html", {
-        'bags': bags,
-        'color_choices': COLOR.choices,
-        'selected_color': selected_color
-    })
+    return _render_bags_page(request, "bag/medium_bags.html", size=2, api_url_name='store:api-bags-medium')
 
 
 def big_bags_page(request):
-    bags = Bag.objects.filter(size=3)
-    selected_color = request.GET.get('color')
-    
-    if selected_color:
-        try:
-            color_id = int(selected_color)
-            bags = bags.filter(color=color_id)
-        except (ValueError, TypeError):
-            pass
-    
-    return render(request, "bag/big_bags.html", {
-        'bags': bags,
-        'color_choices': COLOR.choices,
-        'selected_color': selected_color
-    })
+    return _render_bags_page(request, "bag/big_bags.html", size=3, api_url_name='store:api-bags-big')
 
 
 @login_required(login_url='store:login-page')
@@ -367,32 +648,18 @@ def cart_page(request):
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('/admin/')
     
-    try:
-        user_acc, _ = User_acc.objects.get_or_create(
-            django_user=request.user,
-            defaults={
-                'name': request.user.first_name or request.user.username,
-                'surname': request.user.last_name or request.user.username,
-                'email': request.user.email or f'{request.user.username}@example.com',
-                'street_name': 'Not provided',
-                'home_nr': '0',
-                'city': 'Not provided',
-                'zip_code': '00-000',
-                'country': 'US',
-                'phone_number': '+1234567890',
-            }
-        )
-    except Exception:
+    user_acc = get_user_acc(request)
+    if user_acc is None:
         return redirect('store:login-page')
     
-    cart, _ = Cart.objects.get_or_create(user_cart=user_acc)
+    cart = get_cart(user_acc)
     items = cart.items.select_related('bag').all()
-    total = sum(item.quantity * item.price_at_time for item in items)
     
     return render(request, 'order/cart.html', {
         'cart': cart, 
         'items': items, 
-        'total': total
+        'total': cart.total_price,
+        'cart_item_count': cart.item_count
     })
 
 
@@ -401,31 +668,19 @@ def checkout(request):
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('/admin/')
     
-    try:
-        user_acc, _ = User_acc.objects.get_or_create(
-            django_user=request.user,
-            defaults={
-                'name': request.user.first_name or request.user.username,
-                'surname': request.user.last_name or request.user.username,
-                'email': request.user.email or f'{request.user.username}@example.com',
-                'street_name': 'Not provided',
-                'home_nr': '0',
-                'city': 'Not provided',
-                'zip_code': '00-000',
-                'country': 'US',
-                'phone_number': '+1234567890',
-            }
-        )
-    except Exception:
+    user_acc = get_user_acc(request)
+    if user_acc is None:
         return redirect('store:login-page')
     
     try:
-        cart = Cart.objects.get(user_cart=user_acc)
-        if not cart.items.exists():
-            return redirect('store:cart')
+        cart = user_acc.cart
     except Cart.DoesNotExist:
         return redirect('store:cart')
     
+    items = list(cart.items.select_related('bag'))
+    if not items:
+        return redirect('store:cart')
+    
     form = None
     success = None
     
@@ -445,24 +700,17 @@ def checkout(request):
                     user_acc.phone_number = form.cleaned_data['phone_number']
                     user_acc.save()
                     
-                    total_price = sum(
-                        item.quantity * item.price_at_time 
-                        for item in cart.items.all()
-                    )
                     order = Order.objects.create(
                         user=user_acc,
-                        total_price=total_price,
+                        total_price=items_total(items),
                         status='new'
                     )
+                    create_order_items(order, items)
+                    record_order(order, items)
                     
-                    for item in cart.items.all():
-                        bag = item.bag
-                        bag.amount -= item.quantity
-                        if bag.amount < 0:
-                            bag.amount = 0
-                        bag.save()
+                    decrement_stock(items)
                     
-                    cart.items.all().delete()
+                    clear_cart(cart)
                 
                 return render(request, 'order/checkout.html', {
                     'user_acc': user_acc,
@@ -470,6 +718,13 @@ def checkout(request):
                     'success': True,
                     'order_id': order.id
                 })
+            except OutOfStock as e:
+                for shortage in e.shortages:
+                    form.add_error(
+                        None,
+                        f'Not enough {shortage.bag} in stock. '
+                        f'Requested: {shortage.requested}, available: {shortage.available}.'
+                    )
             except Exception as e:
                 form.add_error(None, f'Error placing order: {str(e)}')
     else:
@@ -497,42 +752,41 @@ def go_to_order_summary(request):
     if not request.user.is_authenticated:
         return redirect('store:login-page')
     
-    user = request.user.user_acc
+    user = get_user_acc(request)
     
     try:
-        cart = Cart.objects.get(user_cart=user)
+        cart = user.cart
     except Cart.DoesNotExist:
         return redirect('store:cart')
     
-    summary = OrderSummary.objects.create(user=user)
-    total = 0
+    items = list(cart.items.all())
     
-    for item in cart.items.all():
-        OrderSummaryItem.objects.create(
+    summary = OrderSummary.objects.create(user=user, total_price=items_total(items))
+    OrderSummaryItem.objects.bulk_create([
+        OrderSummaryItem(
             summary=summary,
-            bag=item.bag,
+            bag_id=item.bag_id,
             quantity=item.quantity,
             price_at_time=item.price_at_time
         )
-        total += item.quantity * item.price_at_time
-    
-    summary.total_price = total
-    summary.save()
+        for item in items
+    ])
     
-    return redirect('store:order-summary')
+    return redirect('store:api-summary')
 
 
 @login_required(login_url='store:login-page')
 def remove_from_cart(request, item_id):
-    try:
-        user_acc = request.user.user_acc
-    except User_acc.DoesNotExist:
+    user_acc = get_user_acc(request)
+    if user_acc is None:
         return redirect('store:login-page')
     
     try:
-        cart = Cart.objects.get(user_cart=user_acc)
+        cart = user_acc.cart
         item = CartItem.objects.get(id=item_id, cart=cart)
-        item.delete()
+        with transaction.atomic():
+            item.delete()
+            adjust_cart_totals(cart, -item.quantity * item.price_at_time, -item.quantity)
     except (Cart.DoesNotExist, CartItem.DoesNotExist):
         pass
     
@@ -545,22 +799,8 @@ def account_profile(request):
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('/admin/')
     
-    try:
-        user_acc, _ = User_acc.objects.get_or_create(
-            django_user=request.user,
-            defaults={
-                'name': request.user.first_name or request.user.username,
-                'surname': request.user.last_name or request.user.username,
-                'email': request.user.email or f'{request.user.username}@example.com',
-                'street_name': 'Not provided',
-                'home_nr': '0',
-                'city': 'Not provided',
-                'zip_code': '00-000',
-                'country': 'US',
-                'phone_number': '+1234567890',
-            }
-        )
-    except Exception:
+    user_acc = get_user_acc(request)
+    if user_acc is None:
         return redirect('store:login-page')
     
     return render(request, 'account/profile.html', {
@@ -569,28 +809,34 @@ def account_profile(request):
     })
 
 
+@login_required(login_url='store:login-page')
+def order_history_page(request):
+    """The user's orders, newest first, with an "Older orders" link"""
+    if request.user.is_authenticated and request.user.is_staff:
+        return redirect('/admin/')
+    
+    user_acc = get_user_acc(request)
+    if user_acc is None:
+        return redirect('store:login-page')
+    
+    paginator = OrderHistoryPagination()
+    drf_request = Request(request)
+    orders = paginator.paginate_queryset(order_history(user_acc), drf_request)
+    return render(request, 'account/orders.html', {
+        'orders': orders,
+        'next_url': paginator.get_next_link(),
+        'previous_url': paginator.get_previous_link(),
+    })
+
+
 @login_required(login_url='store:login-page')
 def edit_account(request):
     """Edit the user's account information"""
     if request.user.is_authenticated and request.user.is_staff:
         return redirect('/admin/')
     
-    try:
-        user_acc, _ = User_acc.objects.get_or_create(
-            django_user=request.user,
-            defaults={
-                'name': request.user.first_name or request.user.username,
-                'surname': request.user.last_name or request.user.username,
-                'email': request.user.email or f'{request.user.username}@example.com',
-                'street_name': 'Not provided',
-                'home_nr': '0',
-                'city': 'Not provided',
-                'zip_code': '00-000',
-                'country': 'US',
-                'phone_number': '+1234567890',
-            }
-        )
-    except Exception:
+    user_acc = get_user_acc(request)
+    if user_acc is None:
         return redirect('store:login-page')
     
     form = None
@@ -618,7 +864,7 @@ def edit_account(request):
                     request.user.email = form.cleaned_data['email']
                     request.user.save()
                     
-                    success = 'Account information updated successfully!'
+                success = 'Account information updated successfully!'
             except Exception as e:
                 error = f'Error updating account: {str(e)}'
     else:
@@ -643,3 +889,20 @@ def edit_account(request):
     })
 
 
+def _metrics_allowed(request):
+    token = settings.STORE_METRICS_TOKEN
+    keyword, _, key = request.headers.get('Authorization', '').partition(' ')
+    if token and keyword == 'Bearer' and hmac.compare_digest(key.strip(), token):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics_view(request):
+    if not _metrics_allowed(request):
+        response = HttpResponse('Authentication required.', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )